@@ -0,0 +1,178 @@
+"""
+End-to-end kickoff benchmark against a local mock Miqa server.
+
+Each scenario generates sample folders on disk, starts benchmarks/mock_miqa.py
+with the scenario's latency/bandwidth/error settings, and runs run-miqa.py in
+a fresh interpreter to trigger, upload, set metadata, poll and download a
+report. It reports wall time, per-phase timings (from the JSON summary),
+upload throughput and the requests the server saw.
+
+Usage:
+    python benchmarks/kickoff.py [--scenarios small-10 large-10 ...] [--json-output-file results.json]
+                                 [--baseline previous.json --max-regression 0.25] [-- extra CLI args]
+
+Exits non-zero if a run fails or, with --baseline, if a scenario's wall time
+regressed by more than --max-regression.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_miqa import MockConfig, MockMiqaServer  # noqa: E402
+
+# name -> samples, files per sample, bytes per file, mock settings, and whether
+# failed uploads are expected (miqatools doesn't retry uploads on its own).
+SCENARIOS = {
+    "small-10": {"samples": 10, "files": 20, "file_bytes": 4 * 1024},
+    "small-1000": {"samples": 1000, "files": 2, "file_bytes": 4 * 1024},
+    "small-10000": {"samples": 10000, "files": 1, "file_bytes": 1024},
+    "large-10": {"samples": 10, "files": 1, "file_bytes": 16 * 1024 * 1024},
+    "flaky-100": {
+        "samples": 100,
+        "files": 5,
+        "file_bytes": 64 * 1024,
+        "mock": {"latency_ms": 20, "bandwidth_mbps": 20, "error_rate": 0.02},
+        "allow_failed_uploads": True,
+    },
+}
+
+def build_dataset(root, samples, files, file_bytes):
+    """Write `samples` folders of `files` files each under root. Returns the total bytes written."""
+    block = os.urandom(min(file_bytes, 1024 * 1024))
+    for i in range(samples):
+        folder = os.path.join(root, f"sample{i}")
+        os.makedirs(folder, exist_ok=True)
+        for j in range(files):
+            with open(os.path.join(folder, f"output{j}.dat"), "wb") as f:
+                remaining = file_bytes
+                while remaining:
+                    f.write(block[:remaining])
+                    remaining -= min(len(block), remaining)
+    return samples * files * file_bytes
+
+def run_scenario(name, spec, extra_cli_args, workdir):
+    data_dir = os.path.join(workdir, name, "data")
+    total_bytes = build_dataset(data_dir, spec["samples"], spec["files"], spec["file_bytes"])
+    summary_file = os.path.join(workdir, name, "summary.json")
+    log_file = os.path.join(workdir, name, "kickoff.log")
+
+    config = MockConfig(samples=spec["samples"], seed=0, **spec.get("mock", {}))
+    with MockMiqaServer(config) as mock:
+        env = mock.client_env(dict(os.environ, XDG_CACHE_HOME=os.path.join(workdir, name, "cache"), PYTHONUNBUFFERED="1"))
+        command = [
+            sys.executable, os.path.join(REPO_ROOT, "run-miqa.py"),
+            "--server", mock.server,
+            "--api-key", "benchmark",
+            "--trigger-id", "benchmark",
+            "--version-name", f"benchmark-{name}",
+            "--locations", data_dir,
+            "--set-metadata", '{"benchmark": "' + name + '"}',
+            "--wait-for-completion",
+            "--poll-mode", "adaptive",
+            "--poll-initial-interval", "0.2",
+            "--poll-frequency", "1",
+            "--download-reports", "pdf",
+            "--report-folder", os.path.join(workdir, name, "reports"),
+            "--json-output-file", summary_file,
+            *extra_cli_args,
+        ]
+        started = time.time()
+        with open(log_file, "w") as log:
+            returncode = subprocess.run(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+        wall_seconds = time.time() - started
+        server = mock.state.snapshot()
+
+    summary = {}
+    if os.path.exists(summary_file):
+        with open(summary_file) as f:
+            summary = json.load(f)
+    timings = summary.get("timings", {})
+    phases = timings.get("phases", {})
+    uploads = summary.get("uploads", [])
+    failed_uploads = sum(1 for upload in uploads if upload.get("status") != "success")
+    upload_seconds = phases.get("uploads") or 0
+    ok = returncode == 0 and bool(summary) and (failed_uploads == 0 or spec.get("allow_failed_uploads", False))
+
+    result = {
+        "scenario": name,
+        "ok": ok,
+        "returncode": returncode,
+        "samples": spec["samples"],
+        "files": spec["samples"] * spec["files"],
+        "bytes": total_bytes,
+        "wall_seconds": round(wall_seconds, 3),
+        "upload_mb_per_s": round(total_bytes / (1024 * 1024) / upload_seconds, 3) if upload_seconds else None,
+        "phases": phases,
+        "failed_uploads": failed_uploads,
+        "client_http": timings.get("http"),
+        "server": server,
+        "log_file": log_file,
+    }
+    status = "✅" if ok else "❌"
+    print(
+        f"{status} {name}: {result['wall_seconds']:.2f}s wall, {result['files']} files / "
+        f"{total_bytes / (1024 * 1024):.1f} MB, uploads {upload_seconds:.2f}s"
+        + (f" ({result['upload_mb_per_s']} MB/s)" if result["upload_mb_per_s"] else "")
+        + f", {server['total_requests']} requests ({server['errors_injected']} injected errors)"
+    )
+    if phases:
+        print("   phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items()))
+    if failed_uploads or not ok:
+        print(f"   exit code {returncode}, {failed_uploads} failed uploads; see {log_file}")
+    return result
+
+def compare_to_baseline(results, baseline_file, max_regression):
+    with open(baseline_file) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+    regressed = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if not before or not before.get("wall_seconds"):
+            continue
+        change = result["wall_seconds"] / before["wall_seconds"] - 1
+        marker = "❌" if change > max_regression else "✅"
+        print(f"{marker} {result['scenario']}: {before['wall_seconds']:.2f}s -> {result['wall_seconds']:.2f}s ({change:+.0%})")
+        if change > max_regression:
+            regressed.append(result["scenario"])
+    return regressed
+
+def main():
+    argv = sys.argv[1:]
+    extra_cli_args = []
+    if "--" in argv:
+        extra_cli_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--json-output-file", type=str, help="Optional path to write the results as JSON")
+    parser.add_argument("--baseline", type=str, help="Results JSON from an earlier run to compare wall times against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed wall time increase over the baseline (fraction)")
+    parser.add_argument("--keep", action="store_true", help="Keep generated data, logs and summaries")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="miqa-offline-bench-")
+    results = []
+    try:
+        results = [run_scenario(name, SCENARIOS[name], extra_cli_args, workdir) for name in args.scenarios]
+        if args.json_output_file:
+            with open(args.json_output_file, "w") as f:
+                json.dump(results, f, indent=2)
+        regressed = compare_to_baseline(results, args.baseline, args.max_regression) if args.baseline else []
+    finally:
+        if args.keep or not all(r["ok"] for r in results):
+            print(f"Benchmark files kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if all(r["ok"] for r in results) and not regressed else 1)
+
+if __name__ == "__main__":
+    main()
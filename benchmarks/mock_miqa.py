@@ -0,0 +1,438 @@
+"""
+A local stand-in for a Miqa server, for benchmarking miqa-offline end to end.
+
+Implements the endpoints the CLI (and miqatools, for uploads) call:
+
+* trigger info, triggering a run, metadata, version overrides and status polling
+* per-dataset execution lookup, start time and completion
+* upload URLs, plus the upload targets themselves (GCS-style PUTs, including
+  resumable Content-Range chunks, and S3-style multipart POSTs)
+* PDF/JSON report downloads, with Range support
+
+Latency, per-connection bandwidth and error injection are configurable. The
+server speaks HTTPS with a throwaway self-signed certificate because the CLI
+and miqatools always use https://; point REQUESTS_CA_BUNDLE and SSL_CERT_FILE
+at `MockMiqaServer.cert_file` in the client's environment.
+
+Usage:
+    python benchmarks/mock_miqa.py [--port 8443] [--samples 10] [--latency-ms 0] [--error-rate 0]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+IO_CHUNK_SIZE = 64 * 1024
+
+class MockConfig:
+    def __init__(
+        self,
+        samples=10,
+        latency_ms=0.0,
+        bandwidth_mbps=0.0,
+        error_rate=0.0,
+        polls_until_done=2,
+        report_bytes=256 * 1024,
+        cloud_provider="google",
+        seed=None,
+    ):
+        self.ds_id_mapping = {f"sample{i}": 1000 + i for i in range(samples)}
+        self.latency_ms = latency_ms
+        self.bandwidth_mbps = bandwidth_mbps
+        self.error_rate = error_rate
+        self.polls_until_done = polls_until_done
+        self.report_bytes = report_bytes
+        self.cloud_provider = cloud_provider
+        self.random = random.Random(seed)
+
+class MockState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.run_ids = itertools.count(1)
+        self.exec_ids = itertools.count(1)
+        self.exec_lookup = {}
+        self.exec_status = {}
+        self.polls = {}
+        self.upload_sessions = {}
+        self.requests = {}
+        self.errors_injected = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "errors_injected": self.errors_injected,
+                "bytes_uploaded": self.bytes_uploaded,
+                "bytes_downloaded": self.bytes_downloaded,
+                "executions_completed": sum(1 for status in self.exec_status.values() if status == "done"),
+                "executions_failed": sum(1 for status in self.exec_status.values() if status == "failed"),
+            }
+
+# (method or None for any, path regex, endpoint name). First match wins.
+ROUTES = [
+    (None, r"/api/test_trigger/[^/]+/get_ds_id_mapping", "get_ds_id_mapping"),
+    ("POST", r"/api/test_trigger/[^/]+/execute(_and_set_details)?", "execute"),
+    (None, r"/api/test_chain_run/(?P<run>\d+)/set_trigger_info", "set_trigger_info"),
+    (None, r"/api/test_chain_run/(?P<run>\d+)/get_latest_for_metadata", "get_latest_for_metadata"),
+    (None, r"/api/test_chain_run/(?P<run>\d+)/set_version_overrides", "set_version_overrides"),
+    (None, r"/api/test_chain_run/(?P<run>\d+)/get_status", "get_status"),
+    (None, r"/api/test_chain_run/(?P<run>\d+)/add_user_logs", "add_user_logs"),
+    ("GET", r"/api/test_chain_run/(?P<run>\d+)/(?P<report>pdf|json)", "report"),
+    (None, r"/api/get_tcr_exec_info/(?P<run>\d+)", "get_tcr_exec_info"),
+    (None, r"/api/execution/(?P<exec>\d+)/set_start_time", "set_start_time"),
+    (None, r"/api/execution/(?P<exec>\d+)/mark_(?P<outcome>complete|failed)", "mark_execution"),
+    (None, r"/api/execution/(?P<exec>\d+)", "execution"),
+    (None, r"/api/resumable_upload", "resumable_upload"),
+    ("PUT", r"/upload/(?P<key>.+)", "upload_put"),
+    ("POST", r"/upload", "upload_post"),
+]
+
+class MockMiqaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockMiqa/1.0"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm plus delayed ACKs add ~40ms to every response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        for method, pattern, endpoint in ROUTES:
+            match = re.fullmatch(pattern, parsed.path)
+            if match and method in (None, self.command):
+                break
+        else:
+            self._read_body()
+            return self._send_json({"error": f"no mock for {self.command} {parsed.path}"}, 404)
+
+        self.state.count(endpoint)
+        if self.config.latency_ms:
+            time.sleep(self.config.latency_ms / 1000)
+        if self.config.error_rate and self.config.random.random() < self.config.error_rate:
+            self._read_body()
+            with self.state.lock:
+                self.state.errors_injected += 1
+            # Triggering isn't idempotent, so only fail it in a way clients know is safe to retry.
+            return self._send_json({"error": "injected failure"}, 429 if endpoint == "execute" else 503)
+        getattr(self, f"_handle_{endpoint}")(match.groupdict(), query)
+
+    def _read_body(self):
+        """Read the request body (Content-Length or chunked), throttled to the configured bandwidth."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            pieces = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                pieces.append(self._throttled_read(size))
+                self.rfile.readline()
+            return b"".join(pieces)
+        return self._throttled_read(int(self.headers.get("Content-Length") or 0))
+
+    def _throttled_read(self, length):
+        pieces = []
+        remaining = length
+        started = time.time()
+        while remaining:
+            piece = self.rfile.read(min(IO_CHUNK_SIZE, remaining))
+            if not piece:
+                break
+            pieces.append(piece)
+            remaining -= len(piece)
+            self._throttle(length - remaining, started)
+        return b"".join(pieces)
+
+    def _throttle(self, transferred, started):
+        if self.config.bandwidth_mbps:
+            expected = transferred / (self.config.bandwidth_mbps * 1024 * 1024)
+            delay = expected - (time.time() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, status, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    # Miqa API
+
+    def _handle_get_ds_id_mapping(self, params, query):
+        self._read_body()
+        self._send_json({"data": self.config.ds_id_mapping})
+
+    def _handle_execute(self, params, query):
+        self._read_body()
+        run_id = next(self.state.run_ids)
+        link = f"https://{self.server.netloc}/test_chain_run/{run_id}"
+        self._send_json({"run_id": run_id, "link": link, "details": {"links": {"grid_upload": f"{link}/upload"}}})
+
+    def _handle_set_trigger_info(self, params, query):
+        self._read_body()
+        self._send_json({"message": "ok"})
+
+    def _handle_get_latest_for_metadata(self, params, query):
+        self._read_body()
+        self._send_json({"tcr_id": int(params["run"])})
+
+    def _handle_set_version_overrides(self, params, query):
+        self._read_body()
+        self._send_json({"message": "ok"})
+
+    def _handle_add_user_logs(self, params, query):
+        self._read_body()
+        self._send_json({"message": "ok"})
+
+    def _handle_get_status(self, params, query):
+        self._read_body()
+        run_id = int(params["run"])
+        with self.state.lock:
+            self.state.polls[run_id] = self.state.polls.get(run_id, 0) + 1
+            done = self.state.polls[run_id] > self.config.polls_until_done
+        data = {"status": "done" if done else "running", "link": f"https://{self.server.netloc}/test_chain_run/{run_id}"}
+        if done:
+            data["outcome"] = "passed"
+        self._send_json({"data": data})
+
+    def _handle_report(self, params, query):
+        self._read_body()
+        size = self.config.report_bytes
+        start = 0
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if start >= size:
+                return self._send_empty(416, {"Content-Range": f"bytes */{size}"})
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/pdf" if params["report"] == "pdf" else "application/json")
+        self.send_header("Content-Length", str(size - start))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        sent, started = 0, time.time()
+        block = b"\0" * IO_CHUNK_SIZE
+        while start + sent < size:
+            piece = block[:min(IO_CHUNK_SIZE, size - start - sent)]
+            self.wfile.write(piece)
+            sent += len(piece)
+            self._throttle(sent, started)
+        with self.state.lock:
+            self.state.bytes_downloaded += sent
+
+    def _handle_get_tcr_exec_info(self, params, query):
+        self._read_body()
+        key = (int(params["run"]), query.get("ds_id"))
+        with self.state.lock:
+            if key not in self.state.exec_lookup:
+                self.state.exec_lookup[key] = next(self.state.exec_ids)
+            exec_id = self.state.exec_lookup[key]
+            status = self.state.exec_status.get(exec_id, "queued")
+        self._send_json({"exec_id": exec_id, "exec_status": status})
+
+    def _handle_set_start_time(self, params, query):
+        self._read_body()
+        with self.state.lock:
+            self.state.exec_status[int(params["exec"])] = "running"
+        self._send_json({"message": "ok"})
+
+    def _handle_mark_execution(self, params, query):
+        self._read_body()
+        status = "done" if params["outcome"] == "complete" else "failed"
+        with self.state.lock:
+            self.state.exec_status[int(params["exec"])] = status
+        self._send_json({"message": f"Execution {params['exec']} marked {status}"})
+
+    def _handle_execution(self, params, query):
+        self._read_body()
+        exec_id = params["exec"]
+        self._send_json({
+            "bucket": "mock-bucket",
+            "key": f"executions/{exec_id}",
+            "cloud_provider": self.config.cloud_provider,
+            "org_config_id": None,
+        })
+
+    def _handle_resumable_upload(self, params, query):
+        self._read_body()
+        key = query.get("key", "upload")
+        target = f"https://{self.server.netloc}/upload/{key}"
+        if query.get("cloud_provider") == "google":
+            url = target
+        else:
+            url = {"url": f"https://{self.server.netloc}/upload", "fields": {"key": key}}
+        self._send_json({"url": url})
+
+    # Upload targets
+
+    def _handle_upload_put(self, params, query):
+        body = self._read_body()
+        with self.state.lock:
+            self.state.bytes_uploaded += len(body)
+        content_range = self.headers.get("Content-Range")
+        if not content_range:
+            return self._send_empty(200)
+        match = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+)", content_range)
+        if not match:
+            return self._send_empty(400)
+        total = int(match.group(3))
+        with self.state.lock:
+            received = self.state.upload_sessions.get(params["key"], 0)
+            if match.group(1) is not None and int(match.group(1)) == received:
+                received += len(body)
+                self.state.upload_sessions[params["key"]] = received
+        if received >= total:
+            return self._send_empty(200)
+        return self._send_empty(308, {"Range": f"bytes=0-{received - 1}"} if received else None)
+
+    def _handle_upload_post(self, params, query):
+        body = self._read_body()
+        with self.state.lock:
+            self.state.bytes_uploaded += len(body)
+        self._send_empty(204)
+
+def generate_self_signed_cert(folder):
+    """Create a throwaway certificate for localhost with the openssl CLI. Returns (cert_file, key_file)."""
+    cert_file = os.path.join(folder, "mock-miqa.crt")
+    key_file = os.path.join(folder, "mock-miqa.key")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-keyout", key_file, "-out", cert_file, "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return cert_file, key_file
+
+class MockMiqaServer:
+    """Runs the mock over HTTPS on a background thread. Use as a context manager."""
+
+    def __init__(self, config=None, port=0):
+        self.config = config or MockConfig()
+        self.port = port
+        self._tmp = None
+        self.httpd = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cert_file, key_file = generate_self_signed_cert(self._tmp.name)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cert_file, key_file)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), MockMiqaHandler)
+        self.httpd.daemon_threads = True
+        # Handshake in the handler thread, not in accept() on the serving thread.
+        self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True, do_handshake_on_connect=False)
+        self.httpd.config = self.config
+        self.httpd.state = MockState()
+        self.httpd.netloc = f"localhost:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    @property
+    def server(self):
+        """Value to pass as --server."""
+        return self.httpd.netloc
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    def client_env(self, env=None):
+        """Environment for a client process that should trust this server's certificate."""
+        return dict(env if env is not None else os.environ, REQUESTS_CA_BUNDLE=self.cert_file, SSL_CERT_FILE=self.cert_file)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="Per-connection cap in MB/s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with 503 (429 for triggers)")
+    parser.add_argument("--polls-until-done", type=int, default=2)
+    parser.add_argument("--cloud-provider", choices=["google", "aws"], default="google")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        samples=args.samples,
+        latency_ms=args.latency_ms,
+        bandwidth_mbps=args.bandwidth_mbps,
+        error_rate=args.error_rate,
+        polls_until_done=args.polls_until_done,
+        cloud_provider=args.cloud_provider,
+    )
+    with MockMiqaServer(config, port=args.port) as mock:
+        print(f"Mock Miqa listening on https://{mock.server} (certificate: {mock.cert_file})")
+        print(f"Sample names: sample0 .. sample{args.samples - 1}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(json.dumps(mock.state.snapshot(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold-start benchmark for the miqa-offline CLI.
+
+Runs `--help` and a network-free `--dry-run` (against a pre-seeded trigger
+cache) in fresh interpreters, and checks that:
+
+* the time spent importing miqa_offline and its dependencies stays under a target, and
+* heavy dependencies are only imported on the paths that need them
+  (nothing heavy for `--help`, no miqatools for a cloud-location dry run).
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--help-target-ms 150] [--dry-run-target-ms 600]
+
+Exits non-zero if a target is missed or a forbidden module is imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from miqa_offline.cache import TriggerInfoCache  # noqa: E402
+
+HEAVY_MODULES = ["requests", "yaml", "rich", "miqatools", "aiohttp"]
+SERVER = "benchmark.miqa.invalid"
+TRIGGER_ID = "bench-trigger"
+
+def measure(cli_args, env):
+    """Run the CLI once with -X importtime; return (import ms excluding `site`, top-level modules imported)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "miqa_offline", *cli_args],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.add(name.split(".")[0])
+        # Only count top-level imports (no indentation), and leave out the
+        # interpreter's own site-packages processing.
+        if not line.split("|")[2].startswith("  ") and name != "site":
+            total_us += int(cumulative)
+    if result.returncode != 0:
+        raise RuntimeError(f"CLI exited with {result.returncode}:\n{result.stderr[-2000:]}")
+    return total_us / 1000, modules
+
+def run_scenario(name, cli_args, env, runs, target_ms, forbidden):
+    timings = []
+    modules = set()
+    for _ in range(runs):
+        ms, modules = measure(cli_args, env)
+        timings.append(ms)
+    median = statistics.median(timings)
+    leaked = sorted(set(forbidden) & modules)
+    ok = median <= target_ms and not leaked
+    print(
+        f"{'✅' if ok else '❌'} {name}: median import time {median:.1f} ms "
+        f"(min {min(timings):.1f}, max {max(timings):.1f}, target {target_ms} ms)"
+    )
+    print(f"   heavy modules imported: {', '.join(sorted(set(HEAVY_MODULES) & modules)) or 'none'}")
+    if leaked:
+        print(f"   ❌ should not import: {', '.join(leaked)}")
+    return {"scenario": name, "median_ms": round(median, 2), "timings_ms": timings, "modules": sorted(set(HEAVY_MODULES) & modules), "ok": ok}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--help-target-ms", type=float, default=150)
+    parser.add_argument("--dry-run-target-ms", type=float, default=600)
+    parser.add_argument("--json-output-file", type=str, help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Seed the trigger cache so the dry run never touches the network.
+        seeded = TriggerInfoCache(types.SimpleNamespace(miqa_server=SERVER), cache_dir=cache_dir)
+        seeded._write(TRIGGER_ID, {"sample1": 1, "sample2": 2})
+
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        results = [
+            run_scenario("--help", ["--help"], env, args.runs, args.help_target_ms, HEAVY_MODULES),
+            run_scenario(
+                "--dry-run (cloud locations)",
+                [
+                    "--server", SERVER,
+                    "--api-key", "benchmark",
+                    "--trigger-id", TRIGGER_ID,
+                    "--version-name", "benchmark",
+                    "--outputs-already-on-cloud",
+                    "--locations", '{"sample1": "gs://bucket/sample1", "sample2": "gs://bucket/sample2"}',
+                    "--trigger-cache-dir", cache_dir,
+                    "--dry-run",
+                ],
+                env,
+                args.runs,
+                args.dry_run_target_ms,
+                ["miqatools", "aiohttp"],
+            ),
+        ]
+
+    if args.json_output_file:
+        with open(args.json_output_file, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
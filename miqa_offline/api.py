@@ -0,0 +1,80 @@
+import json
+import sys
+
+from .console import summarize_body
+
+def trigger_offline_test_and_get_run_info(
+    client,
+    trigger_id,
+    version_name,
+    local,
+    ds_id_overrides=None,
+    app_name="mn",
+    additional_query_params="",
+    raise_if_multi_execs=False,
+    debug=False,
+):
+    url = client.url(f"test_trigger/{trigger_id}/{'execute_and_set_details' if not local else 'execute'}")
+    query = f"?app={app_name}&name={version_name}&offline_version=1&skip_check_docker=1&is_non_docker=1&raise_if_multi_execs={raise_if_multi_execs}"
+
+    if additional_query_params and debug:
+        print(f"🧪 Raw additional_query_params: [{additional_query_params}]")
+        print("🧪 Hexdump of additional_query_params:")
+        print("    " + " ".join(f"{ord(c):02x}" for c in additional_query_params))
+        query += additional_query_params
+
+    url += query
+    if debug:
+        print(f"🧪 Final URL being called:\n{url}")
+
+    body = ds_id_overrides if not local else {}
+    if debug:
+        print(f"Triggering offline test with body: {json.dumps(body, indent=2)}")
+    else:
+        print(f"Triggering offline test with body: {summarize_body(body)}")
+    response = client.post(url, json=body, idempotent=False)
+
+    if response.ok:
+        return response.json()
+    else:
+        print(f"Error: {response.text}")
+        raise Exception(f"Failed to kick off the run at url '{url}'")
+
+def update_metadata(metadata, client, run_id):
+    response = client.post(f"test_chain_run/{run_id}/set_trigger_info", json=metadata)
+    if response.ok:
+        return response.json()
+    else:
+        print(f"Error: {response.text}")
+        raise Exception(f"Failed to update metadata for {run_id}")
+
+def get_latest_tcr_matching_metadata(client, run_id, metadata_key, metadata_value):
+    response = client.get(
+        f"test_chain_run/{run_id}/get_latest_for_metadata",
+        params={"metadata_key": metadata_key, "metadata_value": metadata_value},
+    )
+    if response.ok:
+        return response.json().get("tcr_id")
+    else:
+        print(f"Error: {response.text}", file=sys.stderr)
+        sys.exit(1)
+
+def set_version_overrides(overrides_lookup, client, run_id):
+    response = client.post(f"test_chain_run/{run_id}/set_version_overrides", json=overrides_lookup)
+    if response.ok:
+        return response.json()
+    else:
+        print(f"Error: {response.text}", file=sys.stderr)
+        sys.exit(1)
+
+def apply_run_metadata(args, client, run_id, set_metadata_dict):
+    """Set metadata and version overrides on a freshly triggered run, if requested."""
+    if set_metadata_dict:
+        update_metadata(set_metadata_dict, client, run_id)
+
+    if args.get_metadata_key:
+        latest_tcr_matching_metadata = get_latest_tcr_matching_metadata(
+            client, run_id, args.get_metadata_key, args.get_metadata_value
+        )
+        print(f"Latest matching TCR is {latest_tcr_matching_metadata}")
+        set_version_overrides({"-1": latest_tcr_matching_metadata}, client, run_id)
@@ -0,0 +1,146 @@
+import os
+import tarfile
+import uuid
+
+BUNDLE_READ_SIZE = 1024 * 1024
+
+class BundlePolicy:
+    """
+    Decides when a dataset folder is uploaded as a single tar bundle instead of
+    file by file: when it has at least `min_files` files and their average size
+    is at most `max_avg_bytes`.
+    """
+    def __init__(self, min_files=100, max_avg_bytes=256 * 1024):
+        self.min_files = min_files
+        self.max_avg_bytes = max_avg_bytes
+
+    def should_bundle(self, file_count, total_bytes):
+        return file_count >= self.min_files and total_bytes <= self.max_avg_bytes * file_count
+
+def list_bundle_files(root):
+    """
+    Return [(relpath, size)] for every regular file under root, skipping
+    .DS_Store. Like os.walk, symlinked folders aren't followed.
+    """
+    files = []
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=True) and not entry.name.endswith(".DS_Store"):
+                    files.append((os.path.relpath(entry.path, root), entry.stat().st_size))
+    files.sort()
+    return files
+
+class TarStream:
+    """
+    A read-only file-like object that produces an uncompressed tar of the given
+    files on the fly, without staging it on disk. Its exact length is known up
+    front (tar headers are fixed-size), so it can be sent with a Content-Length.
+    """
+    def __init__(self, root, files):
+        self.root = root
+        self.members = []
+        length = 0
+        for relpath, size in files:
+            info = tarfile.TarInfo(relpath.replace(os.sep, "/"))
+            info.size = size
+            info.mtime = int(os.path.getmtime(os.path.join(root, relpath)))
+            info.mode = 0o644
+            header = info.tobuf(format=tarfile.PAX_FORMAT)
+            self.members.append((relpath, size, header))
+            length += len(header) + size + (-size % tarfile.BLOCKSIZE)
+        # Two zero blocks end the archive, then pad to a whole record like tarfile does.
+        length += 2 * tarfile.BLOCKSIZE
+        self.trailer_size = 2 * tarfile.BLOCKSIZE + (-length % tarfile.RECORDSIZE)
+        self.length = length + (-length % tarfile.RECORDSIZE)
+        self._chunks = self._iter_chunks()
+        self._chunk = b""
+        self._pos = 0
+
+    def __len__(self):
+        return self.length
+
+    def _iter_chunks(self):
+        for relpath, size, header in self.members:
+            yield header
+            remaining = size
+            with open(os.path.join(self.root, relpath), "rb") as f:
+                while remaining:
+                    chunk = f.read(min(BUNDLE_READ_SIZE, remaining))
+                    if not chunk:
+                        # The file shrank after it was listed; keep the archive well-formed.
+                        chunk = b"\0" * remaining
+                    remaining -= len(chunk)
+                    yield chunk
+            if size % tarfile.BLOCKSIZE:
+                yield b"\0" * (-size % tarfile.BLOCKSIZE)
+        yield b"\0" * self.trailer_size
+
+    def read(self, size=-1):
+        pieces = []
+        wanted = size
+        while wanted != 0:
+            if self._pos >= len(self._chunk):
+                self._chunk = next(self._chunks, b"")
+                self._pos = 0
+                if not self._chunk:
+                    break
+            end = len(self._chunk) if wanted < 0 else min(len(self._chunk), self._pos + wanted)
+            pieces.append(self._chunk[self._pos:end])
+            if wanted > 0:
+                wanted -= end - self._pos
+            self._pos = end
+        return b"".join(pieces)
+
+class ChainedStream:
+    """Concatenates byte strings and sized file-like objects into one sized, readable stream."""
+    def __init__(self, *parts):
+        self.parts = [part if hasattr(part, "read") else _BytesReader(part) for part in parts]
+        self.length = sum(len(part) for part in self.parts)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        data = b""
+        while self.parts and (size < 0 or len(data) < size):
+            chunk = self.parts[0].read(-1 if size < 0 else size - len(data))
+            if not chunk:
+                self.parts.pop(0)
+                continue
+            data += chunk
+        return data
+
+class _BytesReader:
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.data)
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+def multipart_form_stream(fields, filename, file_stream):
+    """
+    Wrap a sized stream in a multipart/form-data body (as expected by S3
+    presigned POSTs). Returns (stream, content_type).
+    """
+    boundary = uuid.uuid4().hex
+    preamble = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    preamble += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/x-tar\r\n\r\n"
+    ).encode()
+    epilogue = f"\r\n--{boundary}--\r\n".encode()
+    return ChainedStream(preamble, file_stream, epilogue), f"multipart/form-data; boundary={boundary}"
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+def default_cache_dir(*parts):
+    return os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "miqa-offline", *parts)
+
+class TriggerInfoCache:
+    """
+    Caches a trigger's ds_id_mapping (sample name -> dataset ID) in memory
+    and on disk across runs, keyed by server and trigger ID. Both expire after
+    `ttl_seconds`, so a long-lived process (e.g. `miqa-offline serve`) picks
+    up datasets added to the trigger.
+    """
+    def __init__(self, client, cache_dir=None, ttl_seconds=3600, enabled=True):
+        self.client = client
+        self.cache_dir = cache_dir or default_cache_dir("triggers")
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._memo = {}  # trigger_id -> (ds_id_mapping, fetched_at)
+        self._cached = set()
+        self._lock = threading.RLock()
+
+    def _cache_path(self, trigger_id):
+        key = hashlib.sha256(f"{self.client.miqa_server}|{trigger_id}".encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, trigger_id):
+        try:
+            with open(self._cache_path(trigger_id)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("server") != self.client.miqa_server or entry.get("trigger_id") != trigger_id:
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.ttl_seconds:
+            return None
+        return entry.get("ds_id_mapping") or None
+
+    def _write(self, trigger_id, ds_id_mapping):
+        entry = {
+            "server": self.client.miqa_server,
+            "trigger_id": trigger_id,
+            "fetched_at": time.time(),
+            "ds_id_mapping": ds_id_mapping,
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._cache_path(trigger_id))
+        except OSError as e:
+            print(f"⚠️ Could not write trigger cache: {e}")
+
+    def _fetch(self, trigger_id):
+        response = self.client.get(f"test_trigger/{trigger_id}/get_ds_id_mapping")
+        if not response.ok:
+            print(f"Error: {response.text}")
+            raise Exception("Failed to retrieve dataset ID mapping.")
+        return response.json().get("data", {})
+
+    def invalidate(self, trigger_id):
+        with self._lock:
+            self._memo.pop(trigger_id, None)
+            self._cached.discard(trigger_id)
+            try:
+                os.remove(self._cache_path(trigger_id))
+            except OSError:
+                pass
+
+    def is_cached(self, trigger_id):
+        """Whether the last lookup was served from an earlier fetch (memory or disk) rather than from Miqa."""
+        return trigger_id in self._cached
+
+    def get_ds_id_mapping(self, trigger_id, refresh=False):
+        with self._lock:
+            if refresh:
+                self.invalidate(trigger_id)
+            if trigger_id in self._memo:
+                ds_id_mapping, fetched_at = self._memo[trigger_id]
+                if time.time() - fetched_at <= self.ttl_seconds:
+                    self._cached.add(trigger_id)
+                    return ds_id_mapping
+
+            ds_id_mapping = self._read(trigger_id) if self.enabled else None
+            if ds_id_mapping:
+                self._cached.add(trigger_id)
+            else:
+                self._cached.discard(trigger_id)
+                ds_id_mapping = self._fetch(trigger_id)
+                if self.enabled and ds_id_mapping:
+                    self._write(trigger_id, ds_id_mapping)
+            self._memo[trigger_id] = (ds_id_mapping, time.time())
+            return ds_id_mapping
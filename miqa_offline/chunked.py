@@ -0,0 +1,128 @@
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import tempfile
+import time
+
+import requests
+
+from .cache import default_cache_dir
+from .console import format_bytes
+
+# GCS resumable uploads require every chunk except the last to be a multiple of 256 KiB.
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 64 * CHUNK_ALIGNMENT
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class UploadCheckpointStore:
+    """
+    Records the upload session and committed offset of in-progress chunked
+    uploads under ~/.cache/miqa-offline/uploads, keyed by server, run ID,
+    dataset ID and local path, so an interrupted upload can be resumed.
+    """
+    def __init__(self, miqa_server, cache_dir=None):
+        self.miqa_server = miqa_server
+        self.cache_dir = cache_dir or default_cache_dir("uploads")
+
+    def _path(self, run_id, dsid, location):
+        key = hashlib.sha256(f"{self.miqa_server}|{run_id}|{dsid}|{os.path.abspath(location)}".encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, run_id, dsid, location):
+        try:
+            with open(self._path(run_id, dsid, location)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, run_id, dsid, location, checkpoint):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, self._path(run_id, dsid, location))
+        except OSError as e:
+            print(f"⚠️ Could not write upload checkpoint for dataset {dsid}: {e}")
+
+    def clear(self, run_id, dsid, location):
+        try:
+            os.remove(self._path(run_id, dsid, location))
+        except OSError:
+            pass
+
+def _committed_offset(response):
+    """Offset after the last byte the server has persisted, from a 308's Range header."""
+    match = re.match(r"bytes=0-(\d+)", response.headers.get("Range", ""))
+    return int(match.group(1)) + 1 if match else 0
+
+def query_upload_offset(session_url, total_size, session=requests):
+    """
+    Ask a resumable upload session how much it has received. Returns the
+    committed offset, or total_size if the upload is already complete.
+    """
+    response = session.put(session_url, headers={"Content-Range": f"bytes */{total_size}", "Content-Length": "0"})
+    if response.status_code in (200, 201):
+        return total_size
+    if response.status_code == 308:
+        return _committed_offset(response)
+    response.raise_for_status()
+    raise Exception(f"Unexpected status {response.status_code} querying upload session")
+
+def send_chunks(session_url, path, offset=0, chunk_size=DEFAULT_CHUNK_SIZE, max_retries=5, on_progress=None, session=requests):
+    """
+    Upload a file to a resumable upload session from `offset` onward, one
+    Content-Range chunk at a time. Chunks are sliced straight out of a
+    memory map, so file data is never copied into Python buffers. Transient
+    failures re-query the session for its committed offset and continue from
+    there. `on_progress(offset)` is called after every committed chunk.
+    """
+    total_size = os.path.getsize(path)
+    attempt = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        try:
+            while offset < total_size:
+                end = min(offset + chunk_size, total_size)
+                headers = {"Content-Range": f"bytes {offset}-{end - 1}/{total_size}", "Content-Length": str(end - offset)}
+                try:
+                    with view[offset:end] as chunk:
+                        response = session.put(session_url, data=chunk, headers=headers)
+                    status = response.status_code
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response, status = None, None
+                    error = e
+                if status in (200, 201):
+                    offset = total_size
+                elif status == 308:
+                    offset = _committed_offset(response)
+                    attempt = 0
+                elif status is None or status in RETRYABLE_STATUS_CODES:
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise Exception(f"Chunk upload failed after {max_retries} retries: {error if status is None else status}")
+                    time.sleep(min(30.0, 2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+                    offset = query_upload_offset(session_url, total_size, session)
+                    continue
+                else:
+                    raise Exception(f"Chunk upload failed with status {status}: {response.text[:500]}")
+                if on_progress:
+                    on_progress(offset)
+        finally:
+            view.release()
+    return offset
+
+def aligned_chunk_size(chunk_size_mb):
+    """Round a chunk size in MB to a positive multiple of CHUNK_ALIGNMENT."""
+    chunk_size = int(chunk_size_mb * 1024 * 1024)
+    return max(CHUNK_ALIGNMENT, chunk_size - chunk_size % CHUNK_ALIGNMENT)
+
+def describe_progress(dsid, offset, total_size, started, start_offset):
+    elapsed = max(time.time() - started, 1e-6)
+    rate = (offset - start_offset) / elapsed
+    return f"   Dataset {dsid}: {format_bytes(offset)} / {format_bytes(total_size)} ({format_bytes(rate)}/s)"
@@ -1,10 +1,19 @@
-from pathlib import Path
-import runpy, sys
+import sys
 
 def main():
     # Ensure argv[0] shows the right command name
     sys.argv[0] = "miqa-offline"
 
-    # Run your existing run-miqa.py in the same process
-    script_path = Path(__file__).resolve().parent.parent / "run-miqa.py"
-    runpy.run_path(str(script_path), run_name="__main__")
\ No newline at end of file
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "serve":
+        from .daemon import serve_main
+        serve_main(sys.argv[2:])
+    elif command == "wait":
+        from .wait import main as wait_main
+        wait_main(sys.argv[2:])
+    elif command == "submit":
+        from .daemon import submit_main
+        sys.exit(submit_main(sys.argv[2:]))
+    else:
+        from .kickoff import main as kickoff_main
+        kickoff_main()
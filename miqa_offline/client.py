@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+
+def normalize_miqa_endpoint(endpoint):
+    endpoint = endpoint.replace("https://", "").replace("http://", "")
+    if endpoint.endswith("/api"):
+        endpoint = endpoint[:-4]
+    return endpoint.rstrip("/")
+
+class MiqaClient:
+    """
+    Owns one pooled requests.Session for all Miqa API calls, so TLS connections
+    are reused, headers are built once, and transient failures are retried with
+    jittered exponential backoff.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, miqa_server, api_key, timeout=120, max_retries=3, backoff_base=1.0, backoff_max=30.0, pool_size=10, rate_limiter=None):
+        self.miqa_server = miqa_server
+        self.base_url = f"https://{miqa_server}/api"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+        self.headers = {"content-type": "application/json", "app-key": api_key, "app_key": api_key}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.request_count = 0
+        self.retry_count = 0
+        self._count_lock = threading.Lock()
+
+    def _count(self, retry=False):
+        with self._count_lock:
+            self.request_count += 1
+            if retry:
+                self.retry_count += 1
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff_delay(self, attempt, response=None):
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, path, idempotent=True, **kwargs):
+        """
+        Send a request, retrying 5xx/429 responses and connection errors.
+        Non-idempotent calls (e.g. kicking off a run) are only retried on 429,
+        where the server is known not to have acted on the request.
+        """
+        url = path if path.startswith(("https://", "http://")) else self.url(path)
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            is_last = attempt == self.max_retries
+            self._count(retry=attempt > 0)
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            try:
+                with self.rate_limiter.slot("api") if self.rate_limiter else nullcontext():
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if is_last or not idempotent:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"⚠️ {method} {url} failed ({e.__class__.__name__}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+            if response.status_code == 429 and self.rate_limiter:
+                # Slow down every process sharing the limiter, not just this request.
+                self.rate_limiter.throttled(_retry_after_seconds(response))
+            retryable = response.status_code == 429 or (idempotent and response.status_code in self.RETRY_STATUSES)
+            if not retryable or is_last:
+                return response
+            delay = self._backoff_delay(attempt, response)
+            print(f"⚠️ {method} {url} returned {response.status_code}; retrying in {delay:.1f}s...")
+            response.close()
+            time.sleep(delay)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
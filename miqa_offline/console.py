@@ -0,0 +1,90 @@
+import itertools
+import json
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{num_bytes} B"
+        num_bytes /= 1024
+
+def format_location(location, compact=False):
+    if isinstance(location, dict):
+        return json.dumps(location, separators=(",", ":")) if compact else json.dumps(location, indent=2)
+    return str(location)
+
+def summarize_body(body, preview=3):
+    """One-line description of a trigger request body: its size and first few keys, never the whole thing."""
+    if not body:
+        return "{}"
+    keys = list(body)
+    sample = ", ".join(str(key) for key in keys[:preview]) + (", ..." if len(keys) > preview else "")
+    return f"{len(keys)} dataset location overrides ({sample})"
+
+class SampleLog:
+    """
+    Writes one JSON object per line to --sample-log: every resolved sample,
+    then each dataset's upload result, so full per-sample detail is kept out
+    of the console without being lost.
+    """
+    def __init__(self, path):
+        self.path = path
+        open(path, "w").close()
+
+    def write(self, event, records):
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps({"event": event, **record}) + "\n")
+
+def log_effective_config_with_paths(args, ds_id_mapping, locations_lookup_by_sid, sample_names_by_sid=None, sample_log=None):
+    """
+    Print the effective parameters and resolved sample paths. Runs with more
+    than --sample-preview samples (or --console-output summary) get aggregate
+    counts and only the first --sample-preview paths; full detail goes to the
+    optional `sample_log` instead.
+    """
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+    preview = getattr(args, "sample_preview", 20)
+    mode = getattr(args, "console_output", "full")
+    summary = mode == "summary" or (mode == "auto" and len(locations_lookup_by_sid) > preview)
+    table = Table(title="📋 Effective Miqa Parameters", show_lines=not summary)
+
+    table.add_column("Parameter", style="cyan", no_wrap=True)
+    table.add_column("Value", style="white")
+
+    display_items = {
+        "Server": args.server,
+        "Trigger ID": args.trigger_id,
+        "Version Name": args.version_name,
+        "Outputs on Cloud": str(args.outputs_already_on_cloud),
+        "Report Folder": args.report_folder,
+        "Wait for Completion": str(args.wait_for_completion),
+        "Download Reports": ", ".join(args.download_reports or []),
+    }
+
+    for key, val in display_items.items():
+        table.add_row(key, str(val))
+
+    if sample_names_by_sid is None:
+        sample_names_by_sid = {v: k for k, v in ds_id_mapping.items()}
+    if sample_log is not None:
+        sample_log.write("resolved", (
+            {"sample": sample_names_by_sid.get(sid), "ds_id": sid, "location": resolved}
+            for sid, resolved in locations_lookup_by_sid.items()
+        ))
+
+    if summary:
+        table.add_row("Samples", f"{len(locations_lookup_by_sid)} resolved of {len(ds_id_mapping)} in the trigger")
+        table.add_row("Resolved Paths", f"first {min(preview, len(locations_lookup_by_sid))}")
+    else:
+        table.add_row("Resolved Paths", "")
+    rows = itertools.islice(locations_lookup_by_sid.items(), preview) if summary else locations_lookup_by_sid.items()
+    for sid, resolved in rows:
+        sample_name = sample_names_by_sid.get(sid, "(unknown)")
+        table.add_row(f"  {sample_name} ({sid})", format_location(resolved, compact=summary))
+    if summary and len(locations_lookup_by_sid) > preview:
+        hidden = len(locations_lookup_by_sid) - preview
+        table.add_row("  ...", f"{hidden} more" + (f" (all listed in {sample_log.path})" if sample_log else " (use --sample-log to record them all)"))
+
+    console.print(table)
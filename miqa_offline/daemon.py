@@ -0,0 +1,291 @@
+"""
+`miqa-offline serve` keeps a kickoff process warm: dependencies are imported
+once and Miqa API sessions (and their TLS connections) are pooled across
+jobs. `miqa-offline submit` is a thin client that parses the usual kickoff
+arguments, sends them over a Unix socket and streams the job's output back.
+
+Protocol: the client sends one JSON line {"args": {...}, "cwd": "..."}; the
+daemon answers with JSON lines {"type": "stdout"|"stderr", "text": ...} and a
+final {"type": "result", "exit_code": n, "summary": {...}}.
+"""
+import argparse
+import contextvars
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+from .cache import default_cache_dir
+
+# Arguments holding local paths, made absolute by the client so that jobs
+# don't depend on the daemon's working directory.
+PATH_ARGS = (
+    "locations_file",
+    "json_output_file",
+    "report_folder",
+    "trace_file",
+    "sample_log",
+    "default_parent_path",
+    "manifest_dir",
+    "trigger_cache_dir",
+    "upload_checkpoint_dir",
+    "rate_limit_dir",
+    "batch",
+)
+
+_job_output = contextvars.ContextVar("miqa_offline_job_output", default=None)
+
+def default_socket_path():
+    return os.path.join(os.getenv("XDG_RUNTIME_DIR") or default_cache_dir(), "miqa-offline.sock")
+
+class _JobStream:
+    """Forwards a job's stdout or stderr to its client as JSON lines, one message per line of text."""
+    def __init__(self, send, kind):
+        self.send = send
+        self.kind = kind
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        if "\n" in self._buffer:
+            complete, self._buffer = self._buffer.rsplit("\n", 1)
+            self.send({"type": self.kind, "text": complete + "\n"})
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.send({"type": self.kind, "text": self._buffer})
+            self._buffer = ""
+
+class _RoutedOutput:
+    """
+    Stands in for sys.stdout/sys.stderr in the daemon, sending writes to the
+    job whose context is current (asyncio.to_thread and the upload/report
+    pools propagate it) and everything else to the daemon's own stream.
+    """
+    def __init__(self, fallback, index):
+        self._fallback = fallback
+        self._index = index
+
+    def _target(self):
+        streams = _job_output.get()
+        return streams[self._index] if streams else self._fallback
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._fallback, name)
+
+class KickoffDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_jobs=8):
+        self.clients = {}
+        self.trigger_caches = {}
+        self.clients_lock = threading.Lock()
+        self.job_slots = threading.BoundedSemaphore(max_jobs)
+        self.active_jobs = 0
+        self.active_jobs_lock = threading.Lock()
+        # Create the socket owner-only from the start rather than chmod'ing it after bind.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, KickoffJobHandler)
+        finally:
+            os.umask(umask)
+
+    def client_for(self, args):
+        """
+        Return the pooled (MiqaClient, TriggerInfoCache) for this server, API
+        key, HTTP and rate limit settings, creating them on first use. The
+        trigger cache stays warm across jobs unless a job passes --no-trigger-cache.
+        """
+        from .cache import TriggerInfoCache
+        from .client import normalize_miqa_endpoint
+        from .kickoff import create_client
+
+        key = (
+            normalize_miqa_endpoint(args.server),
+            args.api_key,
+            args.http_timeout,
+            args.http_retries,
+            args.rate_limit,
+            args.rate_limit_burst,
+            args.max_concurrent_requests,
+            args.max_concurrent_uploads,
+            args.rate_limit_dir,
+        )
+        with self.clients_lock:
+            if key not in self.clients:
+                self.clients[key] = create_client(args)[0]
+            client = self.clients[key]
+            if args.no_trigger_cache:
+                return client, TriggerInfoCache(client, cache_dir=args.trigger_cache_dir, ttl_seconds=args.trigger_cache_ttl, enabled=False)
+            cache_key = (key, args.trigger_cache_dir, args.trigger_cache_ttl)
+            if cache_key not in self.trigger_caches:
+                self.trigger_caches[cache_key] = TriggerInfoCache(client, cache_dir=args.trigger_cache_dir, ttl_seconds=args.trigger_cache_ttl)
+            return client, self.trigger_caches[cache_key]
+
+    def run_job(self, args):
+        """Run one kickoff (or batch) job. Returns (exit_code, summary)."""
+        from .kickoff import run_batch, run_kickoff
+
+        if args.batch:
+            return run_batch(args), None
+        client, trigger_cache = self.client_for(args)
+        return 0, run_kickoff(args, client, trigger_cache)
+
+class KickoffJobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        send_lock = threading.Lock()
+
+        def send(message):
+            data = (json.dumps(message) + "\n").encode()
+            with send_lock:
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                except OSError:
+                    pass  # The client went away; let the job finish anyway.
+
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError as e:
+            return send({"type": "result", "exit_code": 2, "error": f"Invalid request: {e}"})
+        if request.get("type") == "ping":
+            return send({"type": "pong", "pid": os.getpid(), "active_jobs": self.server.active_jobs})
+
+        args = argparse.Namespace(**request["args"])
+        args.cwd = request.get("cwd")
+        streams = (_JobStream(send, "stdout"), _JobStream(send, "stderr"))
+        exit_code, summary = 1, None
+        with self.server.job_slots:
+            with self.server.active_jobs_lock:
+                self.server.active_jobs += 1
+            token = _job_output.set(streams)
+            try:
+                exit_code, summary = self.server.run_job(args)
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except Exception:
+                traceback.print_exc()
+            finally:
+                for stream in streams:
+                    stream.flush()
+                _job_output.reset(token)
+                with self.server.active_jobs_lock:
+                    self.server.active_jobs -= 1
+        send({"type": "result", "exit_code": exit_code, "summary": summary})
+
+def serve_main(argv=None):
+    parser = argparse.ArgumentParser(prog="miqa-offline serve", description="Run a warm kickoff daemon on a Unix socket.")
+    parser.add_argument("--socket", type=str, default=default_socket_path(), help="Unix socket path (default: $XDG_RUNTIME_DIR/miqa-offline.sock)")
+    parser.add_argument("--max-jobs", type=int, default=8, help="Number of kickoff jobs to run at once")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.socket):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(args.socket)
+            sys.exit(f"❌ A daemon is already listening on {args.socket}")
+        except OSError:
+            os.remove(args.socket)  # Left behind by a daemon that didn't shut down cleanly.
+        finally:
+            probe.close()
+    os.makedirs(os.path.dirname(args.socket) or ".", exist_ok=True)
+
+    # Import everything a job needs up front so the first job is as fast as the rest.
+    from . import api, console, locations, manifest, pipeline, polling, reports, uploads  # noqa: F401
+
+    sys.stdout = _RoutedOutput(sys.stdout, 0)
+    sys.stderr = _RoutedOutput(sys.stderr, 1)
+    server = KickoffDaemon(args.socket, max_jobs=args.max_jobs)
+    print(f"🚀 miqa-offline daemon listening on {args.socket} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+        for client in server.clients.values():
+            client.close()
+        try:
+            os.remove(args.socket)
+        except OSError:
+            pass
+
+def _absolutize(job_args, cwd):
+    for name in PATH_ARGS:
+        value = job_args.get(name)
+        if isinstance(value, str) and value and not os.path.isabs(value):
+            job_args[name] = os.path.join(cwd, value)
+
+def submit_main(argv=None):
+    """Submit the kickoff described by argv to a running daemon and stream its output. Returns the exit code."""
+    parser = argparse.ArgumentParser(prog="miqa-offline submit", add_help=False)
+    parser.add_argument("--socket", type=str, default=default_socket_path())
+    parser.add_argument("--ping", action="store_true", help="Only check that the daemon is up")
+    options, kickoff_argv = parser.parse_known_args(argv)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(options.socket)
+    except OSError as e:
+        print(f"❌ Could not connect to the miqa-offline daemon at {options.socket}: {e}", file=sys.stderr)
+        print("   Start it with: miqa-offline serve", file=sys.stderr)
+        return 2
+
+    open_link = False
+    if options.ping:
+        request = {"type": "ping"}
+    else:
+        from .kickoff import parse_args
+        from .locations import interpolate_env_variables
+
+        job_args = vars(parse_args(kickoff_argv))
+        cwd = os.getcwd()
+        _absolutize(job_args, cwd)
+        # Environment variables are expanded and read here, in the submitting shell's
+        # environment, rather than in the daemon's.
+        for name in ("locations", "set_metadata"):
+            if isinstance(job_args.get(name), str):
+                job_args[name] = interpolate_env_variables(job_args[name])
+        job_args["cloud_prefix"] = os.getenv("MIQA_CLOUD_PREFIX", "")
+        # The browser is opened here, on the submitting side, once the job is done.
+        open_link = job_args.pop("open_link", False)
+        job_args["open_link"] = False
+        request = {"args": job_args, "cwd": cwd}
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode())
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if message["type"] == "stdout":
+                sys.stdout.write(message["text"])
+                sys.stdout.flush()
+            elif message["type"] == "stderr":
+                sys.stderr.write(message["text"])
+                sys.stderr.flush()
+            elif message["type"] == "pong":
+                print(f"✅ Daemon is up (pid {message['pid']}, {message['active_jobs']} active jobs)")
+                return 0
+            elif message["type"] == "result":
+                if message.get("error"):
+                    print(f"❌ {message['error']}", file=sys.stderr)
+                link = (message.get("summary") or {}).get("link")
+                if open_link and link:
+                    import webbrowser
+                    webbrowser.open(link)
+                return message["exit_code"]
+    print("❌ The daemon closed the connection before the job finished", file=sys.stderr)
+    return 1
@@ -0,0 +1,597 @@
+import argparse
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MISSING_PATHS_PREVIEW = 10
+
+def parse_args(argv=None):
+    started = time.time()
+    # Step 1: Parse --config if provided
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", type=str)
+    config_parser.add_argument("--batch", type=str, help="JSONL file with one kickoff job per line (same fields as the CLI or --config)")
+    config_args, remaining_argv = config_parser.parse_known_args(argv)
+    # In batch mode the per-run fields come from the job file instead.
+    batch_mode = bool(config_args.batch)
+    
+    defaults = {}
+    if config_args.config:
+        with open(config_args.config) as f:
+            if config_args.config.endswith((".yaml", ".yml")):
+                import yaml
+                defaults = yaml.safe_load(f)
+            else:
+                defaults = json.load(f)
+    
+    # Step 2: Use env vars for fallback if not in config
+    for key in ["server", "api_key", "trigger_id", "version_name", "locations", "report_folder", "output_parent_folder"]:
+        val = os.getenv(f"MIQA_{key.upper()}")
+        if val and key not in defaults:
+            defaults[key] = val
+    
+    if "report_folder" not in defaults:
+        defaults["report_folder"] = "."
+
+
+    # Step 3: Parse the rest of the args
+    parser = argparse.ArgumentParser(description="CLI tool to trigger MIQA tests, upload data, and update metadata.", parents=[config_parser])
+    parser.set_defaults(**defaults)
+    parser.add_argument("--server", type=str, required="server" not in defaults and not batch_mode)
+    parser.add_argument("--api-key", type=str, required="api_key" not in defaults and not batch_mode)
+    parser.add_argument("--trigger-id", type=str, required="trigger_id" not in defaults and not batch_mode)
+    parser.add_argument("--version-name", type=str, required="version_name" not in defaults and not batch_mode)
+    parser.add_argument("--outputs-already-on-cloud", action='store_true')
+    parser.add_argument("--get-metadata-key", type=str, required=False)
+    parser.add_argument("--get-metadata-value", type=str, required=False)
+    parser.add_argument("--set-metadata", type=str, required=False)
+    parser.add_argument("--locations", type=str, required=False)
+    parser.add_argument("--locations-file", type=str, required=False)
+    parser.add_argument("--output-bucket-override", type=str, required=False)
+    parser.add_argument("--json-output-file", type=str, required=False, help="Optional path to write JSON summary")
+    parser.add_argument("--app-name", type=str, required=False, default="mn", help="App name to include in the trigger call (e.g. 'mn' or 'gh')")
+    parser.add_argument("--additional-query-params", type=str, required=False, default="", help="Extra query string (e.g. '&repo=foo&commit=sha')")
+    parser.add_argument("--wait-for-completion", action="store_true", help="Poll Miqa until the test run is complete")
+    parser.add_argument("--poll-frequency", type=int, default=60, help="Seconds between poll attempts")
+    parser.add_argument("--poll-max-attempts", type=int, default=20, help="Maximum polling attempts")
+    parser.add_argument("--poll-mode", choices=["fixed", "adaptive"], default="fixed", help="'fixed' polls every --poll-frequency seconds; 'adaptive' starts fast and backs off up to --poll-frequency")
+    parser.add_argument("--poll-initial-interval", type=float, default=5, help="First interval in seconds for adaptive polling")
+    parser.add_argument("--poll-timeout", type=float, help="Overall deadline in seconds for adaptive polling (default: poll frequency x max attempts)")
+    parser.add_argument("--download-reports", type=str, nargs="+", help="One or more report types to download after successful completion (e.g. 'pdf', 'json')")
+    parser.add_argument("--report-folder", type=str, help="Where to save downloaded reports")
+    parser.add_argument("--default-parent-path", type=str, default="/data", help="Where to save downloaded reports")    
+    parser.add_argument('--open-link', action='store_true', help="Open the test run link immediately.")
+    parser.add_argument('--strict', action='store_true', help="Fail if paths or samples are invalid")
+    parser.add_argument("--output-parent-folder", type=str, help="Prefix to prepend to each output_folder when uploading or specifying cloud locations")
+    parser.add_argument(
+        "--docker-mode",
+        action="store_true",
+        help="Resolve relative paths under the default parent (e.g. /data). Used inside Docker containers."
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Resolve config and locations, print the effective parameters, then exit without triggering a run")
+    parser.add_argument("--async-pipeline", action="store_true", help="Run uploads, metadata calls and polling concurrently once the run is triggered")
+    parser.add_argument("--stat-workers", type=int, default=16, help="Number of local sample paths to check and scan concurrently")
+    parser.add_argument("--include-files", type=str, action="append", help="Only upload dataset files matching this glob (relative path or file name, e.g. '*.vcf'); may be repeated")
+    parser.add_argument("--exclude-files", type=str, action="append", help="Skip dataset files matching this glob (e.g. '*.tmp' or 'logs/*'); may be repeated")
+    parser.add_argument("--plan", action="store_true", help="Scan the local sample paths, print the estimated upload (files, bytes, largest datasets and files) and exit without triggering a run")
+    parser.add_argument("--bundle-small-files", action="store_true", help="Upload dataset folders made of many small files as a single streamed <folder>.tar. The outputs then arrive in Miqa as that tarball, not as individual files; only use this if your Miqa workflow reads the archive")
+    parser.add_argument("--bundle-min-files", type=int, default=100, help="Minimum number of files in a folder before it is bundled")
+    parser.add_argument("--bundle-max-avg-kb", type=float, default=256, help="Only bundle folders whose average file size is at most this many KB")
+    parser.add_argument("--chunked-uploads", action="store_true", help="Upload large single files in resumable chunks, checkpointed locally")
+    parser.add_argument("--chunked-upload-threshold-mb", type=float, default=100, help="Single files at least this large are uploaded in chunks")
+    parser.add_argument("--chunk-size-mb", type=float, default=16, help="Chunk size in MB for chunked uploads (rounded down to a multiple of 256 KB)")
+    parser.add_argument("--upload-checkpoint-dir", type=str, help="Directory for chunked upload checkpoints (default: ~/.cache/miqa-offline/uploads)")
+    parser.add_argument("--resume-run-id", type=str, help="Skip triggering and continue uploading to this existing run (resumes interrupted chunked uploads)")
+    parser.add_argument("--upload-workers", type=int, default=4, help="Number of datasets to upload concurrently")
+    parser.add_argument("--incremental", action="store_true", help="With --resume-run-id, only upload files that are new or changed since they were last uploaded to that run. A new run's executions start empty, so without it everything is uploaded")
+    parser.add_argument("--incremental-dry-run", action="store_true", help="Print what --incremental would upload and skip, then exit without triggering a run")
+    parser.add_argument("--manifest-dir", type=str, help="Directory for incremental upload manifests (default: ~/.cache/miqa-offline/manifests)")
+    parser.add_argument("--watch", action="store_true", help="Trigger the run right away and upload each dataset's files as they become stable, while outputs are still being produced")
+    parser.add_argument("--watch-settle-seconds", type=float, default=30, help="With --watch, upload a file once its size and mtime haven't changed for this long")
+    parser.add_argument("--watch-idle-seconds", type=float, default=300, help="With --watch and no --watch-sentinel, a dataset folder is done once nothing in it has changed for this long")
+    parser.add_argument("--watch-sentinel", type=str, help="With --watch, a dataset is done (and its files final) once a file with this name exists in its folder (or next to a single-file dataset)")
+    parser.add_argument("--watch-poll-interval", type=float, default=5, help="With --watch, seconds between rescans when inotify isn't available")
+    parser.add_argument("--watch-timeout", type=float, default=24 * 60 * 60, help="With --watch, upload whatever exists and finalize every dataset after this many seconds (default: 24 hours)")
+    parser.add_argument("--console-output", choices=["auto", "full", "summary"], default="auto", help="'full' lists every resolved sample path; 'summary' prints counts and the first --sample-preview paths; 'auto' summarizes runs with more than --sample-preview samples")
+    parser.add_argument("--sample-preview", type=int, default=20, help="Number of sample paths listed in summary console output")
+    parser.add_argument("--sample-log", type=str, help="Optional path to write every resolved sample and its upload result as NDJSON")
+    parser.add_argument("--http-timeout", type=float, default=120, help="Timeout in seconds for each Miqa API request")
+    parser.add_argument("--http-retries", type=int, default=3, help="Retries for transient Miqa API failures (5xx, 429, connection errors)")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Maximum Miqa API requests per second, shared by all miqa-offline processes on this machine (0 = unlimited)")
+    parser.add_argument("--rate-limit-burst", type=float, help="Requests that may be sent back to back before --rate-limit applies (default: 2x the rate)")
+    parser.add_argument("--max-concurrent-requests", type=int, default=0, help="Maximum in-flight Miqa API requests across all miqa-offline processes on this machine (0 = unlimited)")
+    parser.add_argument("--max-concurrent-uploads", type=int, default=0, help="Maximum datasets uploading at once across all miqa-offline processes on this machine (0 = unlimited)")
+    parser.add_argument("--rate-limit-dir", type=str, help="Directory for the shared rate limiter state (default: ~/.cache/miqa-offline/ratelimit)")
+    parser.add_argument("--no-trigger-cache", action="store_true", help="Always fetch trigger info from Miqa instead of using the local cache")
+    parser.add_argument("--refresh-trigger-cache", action="store_true", help="Discard any cached trigger info for this trigger before running")
+    parser.add_argument("--trigger-cache-ttl", type=int, default=3600, help="Seconds a cached trigger info entry stays valid")
+    parser.add_argument("--trigger-cache-dir", type=str, help="Directory for cached trigger info (default: ~/.cache/miqa-offline/triggers)")
+    parser.add_argument("--raise-if-multi-execs", action='store_true')
+    parser.add_argument("--batch-concurrency", type=int, default=4, help="Number of batch jobs to kick off concurrently")
+    parser.add_argument("--trace-file", type=str, help="Optional path to write per-phase timings as a Chrome trace (chrome://tracing, Perfetto)")
+    parser.add_argument("--debug", action="store_true", help="Enable verbose debug logging")
+
+    args = parser.parse_args(remaining_argv)
+    args.batch = config_args.batch
+    args.config_timing = (started, time.time() - started)
+    return args
+
+def create_client(args):
+    from .cache import TriggerInfoCache
+    from .client import MiqaClient, normalize_miqa_endpoint
+    from .ratelimit import rate_limiter_from_args
+
+    miqa_server = normalize_miqa_endpoint(args.server)
+    client = MiqaClient(
+        miqa_server,
+        args.api_key,
+        timeout=args.http_timeout,
+        max_retries=args.http_retries,
+        rate_limiter=rate_limiter_from_args(args, miqa_server),
+    )
+    trigger_cache = TriggerInfoCache(
+        client,
+        cache_dir=args.trigger_cache_dir,
+        ttl_seconds=args.trigger_cache_ttl,
+        enabled=not args.no_trigger_cache,
+    )
+    return client, trigger_cache
+
+def run_kickoff(args, client=None, trigger_cache=None):
+    """
+    Trigger one offline test run, upload its outputs, apply metadata and
+    optionally wait for it and download reports. Returns the JSON summary
+    (run info plus upload/report results), or None for a dry run.
+    """
+    # Imported here rather than at module level so `--help` and argument
+    # errors don't pay for requests/yaml/rich/miqatools.
+    from .api import apply_run_metadata, trigger_offline_test_and_get_run_info
+    from .console import SampleLog, log_effective_config_with_paths
+    from .locations import (
+        PathStats,
+        build_locations_from_parent_dir,
+        convert_location_for_cloud,
+        interpolate_env_variables,
+        load_locations_from_file,
+        parse_yaml_or_json,
+        resolve_local_location,
+    )
+    from .manifest import UploadManifestStore, plan_incremental_uploads
+    from .polling import poll_for_completion, poll_for_completion_adaptive
+    from .reports import download_reports
+    from .timings import Timings
+
+    if client is None:
+        client, trigger_cache = create_client(args)
+    miqa_server = client.miqa_server
+    timings = Timings(client)
+    if getattr(args, "config_timing", None):
+        timings.add("load_config", *args.config_timing)
+    load_started = time.time()
+    if args.refresh_trigger_cache:
+        trigger_cache.invalidate(args.trigger_id)
+
+    if not args.locations and not args.locations_file:
+        raise Exception("You must provide either --locations or --locations-file.")
+    if args.locations and args.locations_file:
+        raise Exception("Please provide only one of --locations or --locations-file (not both).")
+    if args.locations_file and not os.path.exists(args.locations_file):
+        raise FileNotFoundError(f"Locations file not found: {args.locations_file}")
+    if args.watch and args.outputs_already_on_cloud:
+        raise Exception("--watch uploads local outputs and can't be used with --outputs-already-on-cloud.")
+    if args.plan and (args.outputs_already_on_cloud or args.watch):
+        raise Exception("--plan estimates uploads of existing local outputs and can't be used with --outputs-already-on-cloud or --watch.")
+
+    if args.locations_file:
+        locations_lookup_by_samplename = load_locations_from_file(args.locations_file)
+    else:
+        if isinstance(args.locations, str):
+            locations_raw = interpolate_env_variables(args.locations)
+            parsed = parse_yaml_or_json(locations_raw)
+
+            # If the parsed value is a string, treat it as a parent directory and auto-expand.
+            if isinstance(parsed, str):
+                # We need ds_id_mapping to know the expected dataset names.
+                ds_id_mapping = trigger_cache.get_ds_id_mapping(args.trigger_id)
+                if not ds_id_mapping:
+                    raise RuntimeError("Could not resolve dataset names for auto-mapping from parent directory.")
+
+                locations_lookup_by_samplename = build_locations_from_parent_dir(
+                    parsed,
+                    ds_id_mapping,
+                    args.outputs_already_on_cloud
+                )
+            elif isinstance(parsed, dict):
+                locations_lookup_by_samplename = parsed
+            else:
+                raise ValueError("--locations must be a mapping or a parent directory string")
+        else:
+            locations_lookup_by_samplename = args.locations
+
+    set_metadata_raw = interpolate_env_variables(args.set_metadata or "")
+    set_metadata_dict = parse_yaml_or_json(set_metadata_raw) if args.set_metadata else None
+    timings.add("load_locations", load_started, time.time() - load_started, samples=len(locations_lookup_by_samplename))
+
+    with timings.phase("trigger_info_lookup") as phase:
+        ds_id_mapping = trigger_cache.get_ds_id_mapping(args.trigger_id)
+        if trigger_cache.is_cached(args.trigger_id) and any(
+            name not in ds_id_mapping for name in locations_lookup_by_samplename
+        ):
+            # A cached mapping may predate datasets added to the trigger since.
+            print("ℹ️ Cached trigger info is missing some sample names; refreshing from Miqa...")
+            ds_id_mapping = trigger_cache.get_ds_id_mapping(args.trigger_id, refresh=True)
+        phase["from_cache"] = trigger_cache.is_cached(args.trigger_id)
+
+    path_stats = None
+    if not args.outputs_already_on_cloud:
+        # Stat every local path up front, concurrently, so the checks below
+        # and the upload stage never stat the same path twice.
+        path_stats = PathStats()
+        with timings.phase("stat_paths"):
+            path_stats.prefetch(
+                [
+                    resolve_local_location(value, args.docker_mode, args.default_parent_path, getattr(args, "cwd", None))
+                    for name, value in locations_lookup_by_samplename.items()
+                    if isinstance(value, str) and name in ds_id_mapping
+                ],
+                workers=args.stat_workers,
+            )
+
+    passed_names_not_in_mapping = False
+    missing_paths = []
+    locations_lookup_by_sid = {}
+    sample_names_by_sid = {}
+    for sample_name, location_value in locations_lookup_by_samplename.items():
+        sid = ds_id_mapping.get(sample_name)
+        if not sid:
+            passed_names_not_in_mapping = True
+            if args.strict:
+                raise ValueError(f"❌ Strict mode: sample '{sample_name}' not found in trigger mapping.")
+            continue
+        sample_names_by_sid[sid] = sample_name
+
+        if not args.outputs_already_on_cloud:
+            location_value = resolve_local_location(location_value, args.docker_mode, args.default_parent_path, getattr(args, "cwd", None))
+            if isinstance(location_value, str) and not path_stats.exists(location_value):
+                missing_paths.append((sample_name, location_value))
+
+        if args.outputs_already_on_cloud:
+            parsed = convert_location_for_cloud(location_value, getattr(args, "cloud_prefix", None))
+            if args.output_bucket_override and isinstance(parsed, dict) and "output_bucket" not in parsed:
+                parsed["output_bucket"] = args.output_bucket_override
+            # Apply output_parent_folder prefix if needed
+            if args.output_parent_folder and isinstance(parsed, dict) and "output_folder" in parsed:
+                parsed["output_folder"] = os.path.join(args.output_parent_folder.rstrip("/"), parsed["output_folder"].lstrip("/"))
+
+            locations_lookup_by_sid[sid] = parsed
+        else:
+            if not os.path.isabs(location_value):
+                location_value = os.path.join(args.default_parent_path, location_value)
+            locations_lookup_by_sid[sid] = location_value
+
+    if missing_paths and args.watch:
+        print(f"👀 {len(missing_paths)} of {len(locations_lookup_by_sid)} sample paths don't exist yet; they will be uploaded as they appear")
+    elif missing_paths:
+        msg = f"{len(missing_paths)} of {len(locations_lookup_by_sid)} sample paths do not exist"
+        preview = missing_paths if args.debug else missing_paths[:MISSING_PATHS_PREVIEW]
+        details = "\n".join(f"   {sample_name}: {path}" for sample_name, path in preview)
+        if len(preview) < len(missing_paths):
+            details += f"\n   ... and {len(missing_paths) - len(preview)} more (use --debug to list all)"
+        if args.strict:
+            raise FileNotFoundError(f"❌ Strict mode: {msg}:\n{details}")
+        print(f"⚠️ {msg}:\n{details}")
+
+    sample_log = SampleLog(args.sample_log) if args.sample_log else None
+    log_effective_config_with_paths(args, ds_id_mapping, locations_lookup_by_sid, sample_names_by_sid, sample_log)
+
+    if args.strict and not locations_lookup_by_sid:
+        raise RuntimeError("❌ Strict mode: No valid sample paths were resolved. Aborting.")
+
+    upload_scan = None
+    if not args.outputs_already_on_cloud and not args.watch and (args.plan or not (args.dry_run or args.incremental_dry_run)):
+        # Walk every dataset folder once, up front; the upload stage reuses the file lists.
+        from .scan import print_upload_plan, scan_datasets, scan_policy_from_args
+        with timings.phase("scan") as phase:
+            upload_scan = scan_datasets(locations_lookup_by_sid, scan_policy_from_args(args), workers=args.stat_workers, path_stats=path_stats)
+            phase["files"] = sum(len(scan["files"]) for scan in upload_scan.values())
+            phase["bytes"] = sum(scan["bytes"] for scan in upload_scan.values())
+        if args.plan:
+            print_upload_plan(upload_scan, locations_lookup_by_sid, sample_names_by_sid, args.sample_preview)
+            return None
+
+    if args.dry_run:
+        print("🧪 Dry run: not triggering a run.")
+        return None
+
+    manifest_store = None
+    if (args.incremental or args.incremental_dry_run) and not args.outputs_already_on_cloud:
+        manifest_store = UploadManifestStore(miqa_server, cache_dir=args.manifest_dir)
+        if args.incremental_dry_run:
+            destinations = None
+            if args.resume_run_id:
+                from .uploads import execution_destinations
+                destinations = execution_destinations(args.resume_run_id, miqa_server, locations_lookup_by_sid, args.api_key)
+            plan_incremental_uploads(locations_lookup_by_sid, manifest_store, destinations)
+            return None
+
+
+    if args.resume_run_id:
+        print(f"🔁 Resuming uploads for existing run {args.resume_run_id} (not triggering a new run)")
+        run_info = {"run_id": args.resume_run_id}
+    else:
+        with timings.phase("trigger"):
+            run_info = trigger_offline_test_and_get_run_info(
+                client,
+                args.trigger_id,
+                args.version_name,
+                not args.outputs_already_on_cloud,
+                locations_lookup_by_sid,
+                app_name=args.app_name,
+                additional_query_params=args.additional_query_params,
+                raise_if_multi_execs=args.raise_if_multi_execs,
+                debug=args.debug,
+            )
+    run_id = run_info.get("run_id")
+
+    if args.async_pipeline:
+        import asyncio
+        from .pipeline import run_post_trigger_async
+        upload_results, poll_successful = asyncio.run(
+            run_post_trigger_async(args, client, run_id, locations_lookup_by_sid, manifest_store, set_metadata_dict, path_stats, timings, upload_scan)
+        )
+    else:
+        upload_results = []
+        if not args.outputs_already_on_cloud:
+            # miqatools is only needed (and only imported) when uploading from disk.
+            from .uploads import bundle_policy_from_args, chunked_upload_from_args, report_failed_uploads, upload_datasets
+            with timings.phase("uploads") as phase:
+                if args.watch:
+                    from .watch import watch_and_upload, watch_policy_from_args
+                    upload_results = watch_and_upload(
+                        run_id,
+                        miqa_server,
+                        locations_lookup_by_sid,
+                        args.api_key,
+                        watch_policy_from_args(args),
+                        workers=args.upload_workers,
+                        rate_limiter=client.rate_limiter,
+                    )
+                else:
+                    upload_results = upload_datasets(
+                        run_id,
+                        miqa_server,
+                        locations_lookup_by_sid,
+                        args.api_key,
+                        workers=args.upload_workers,
+                        manifest_store=manifest_store,
+                        path_stats=path_stats,
+                        bundle_policy=bundle_policy_from_args(args),
+                        chunked_upload=chunked_upload_from_args(args, miqa_server),
+                        rate_limiter=client.rate_limiter,
+                        upload_scan=upload_scan,
+                    )
+                phase["bytes"] = sum(result.get("bytes", 0) for result in upload_results)
+            timings.add_upload_results(upload_results)
+            report_failed_uploads(upload_results)
+
+        with timings.phase("metadata"):
+            apply_run_metadata(args, client, run_id, set_metadata_dict)
+
+        poll_successful = True
+        if args.wait_for_completion:
+            print("⏳ Polling for completion...")
+            with timings.phase("polling"):
+                if args.poll_mode == "adaptive":
+                    poll_successful = poll_for_completion_adaptive(
+                        run_id,
+                        client,
+                        args.poll_timeout or args.poll_frequency * args.poll_max_attempts,
+                        initial_interval=args.poll_initial_interval,
+                        max_interval=args.poll_frequency,
+                        debug=args.debug,
+                    )
+                else:
+                    poll_successful = poll_for_completion(run_id, client, args.poll_max_attempts, args.poll_frequency)
+
+    if sample_log is not None and upload_results:
+        sample_log.write("upload", (dict(result, sample=sample_names_by_sid.get(result["ds_id"])) for result in upload_results))
+
+    report_results = []
+    if poll_successful and args.download_reports:
+        with timings.phase("report_downloads") as phase:
+            report_results = download_reports(run_id, args.download_reports, args.report_folder, client)
+            phase["bytes"] = sum(result.get("bytes", 0) for result in report_results)
+    elif args.download_reports and not poll_successful:
+        print("⚠️ Skipping report download because test did not complete successfully.")
+
+    print("\n✅ Miqa Test Chain Run Info:")
+    print(json.dumps(run_info, indent=2))
+    
+    # Warn if no valid samples matched
+    if len(locations_lookup_by_sid) == 0 and passed_names_not_in_mapping:
+        print(
+            "⚠️ None of the sample names you provided match this test trigger.\n"
+            "   Please check your sample names.\n"
+            f"   Available sample names: {', '.join(itertools.islice(ds_id_mapping, args.sample_preview))}"
+            + (f", ... ({len(ds_id_mapping)} in total)" if len(ds_id_mapping) > args.sample_preview else "")
+        )
+        
+    expected_sample_count = len(ds_id_mapping)
+    provided_sample_count = len(locations_lookup_by_sid)
+    
+    if provided_sample_count == 0:
+        print("⚠️ No files were uploaded for this run.")
+    elif provided_sample_count < expected_sample_count:
+        print(
+            f"⚠️ Only {provided_sample_count} of {expected_sample_count} expected samples were uploaded."
+        )
+    
+    grid_upload_url = run_info.get("details", {}).get("links", {}).get("grid_upload")
+    if grid_upload_url:
+        print("📥 You can manually upload missing files here:")
+        print(f"   {grid_upload_url}")
+
+    summary = dict(run_info)
+    if upload_results:
+        summary["uploads"] = upload_results
+    if report_results:
+        summary["reports"] = report_results
+    summary["timings"] = timings.summary()
+    if args.trace_file:
+        timings.write_chrome_trace(args.trace_file)
+    if args.json_output_file:
+        with open(args.json_output_file, "w") as f:
+            json.dump(summary, f)
+
+    link = run_info.get("link")
+    if link:
+        print("\n🔗 Open the test run here:")
+        print(link)
+
+        # If the user specified to open the link, do it
+        if args.open_link:
+            try:
+                import webbrowser
+                print("Opening the link now...")
+                webbrowser.open(link)
+            except Exception as e:
+                print(f"⚠️ Could not open browser: {e}")
+
+    return summary
+
+def load_batch_jobs(path):
+    """
+    Read a JSONL job file. Keys may be written like CLI flags ("--trigger-id")
+    or config keys ("trigger_id"); both are normalized to argparse dest names.
+    """
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number} of {path}: {e}")
+            job = {key.lstrip("-").replace("-", "_"): value for key, value in raw.items()}
+            if isinstance(job.get("set_metadata"), dict):
+                job["set_metadata"] = json.dumps(job["set_metadata"])
+            if isinstance(job.get("download_reports"), str):
+                job["download_reports"] = job["download_reports"].split()
+            jobs.append(job)
+    return jobs
+
+def run_batch(args):
+    """
+    Kick off every job in the --batch file with up to --batch-concurrency jobs
+    in flight, sharing one client and trigger cache per server. Runs that asked
+    to wait are then polled together. Returns the process exit code.
+    """
+    from .client import normalize_miqa_endpoint
+    from .polling import wait_for_runs
+    from .reports import download_reports
+
+    jobs = load_batch_jobs(args.batch)
+    print(f"📦 Running {len(jobs)} batch jobs with concurrency {args.batch_concurrency}...")
+
+    shared = {}
+    shared_lock = threading.Lock()
+
+    def get_shared_client(job_args):
+        key = (normalize_miqa_endpoint(job_args.server), job_args.api_key)
+        with shared_lock:
+            if key not in shared:
+                shared[key] = create_client(job_args)
+            return shared[key]
+
+    def kickoff(index, job):
+        job_args = argparse.Namespace(**{**vars(args), "json_output_file": None, "trace_file": None, "open_link": False, **job})
+        job_args.batch = None
+        result = {"job": index, "trigger_id": job_args.trigger_id, "version_name": job_args.version_name}
+        try:
+            missing = [key for key in ("server", "api_key", "trigger_id", "version_name") if not getattr(job_args, key, None)]
+            if missing:
+                raise ValueError(f"Missing required field(s): {', '.join(missing)}")
+            # Waiting and report downloads happen once for the whole batch below.
+            result["wait"] = job_args.wait_for_completion
+            result["download_reports"] = job_args.download_reports
+            job_args.wait_for_completion = False
+            job_args.download_reports = None
+            client, trigger_cache = get_shared_client(job_args)
+            result["client"] = client
+            summary = run_kickoff(job_args, client, trigger_cache)
+            if summary is None:
+                result["status"] = "dry_run"
+                return result
+            result.update({
+                "status": "triggered",
+                "run_id": summary.get("run_id"),
+                "link": summary.get("link"),
+                "uploads": summary.get("uploads", []),
+            })
+            if any(upload["status"] != "success" for upload in result["uploads"]):
+                result["status"] = "upload_failed"
+        except (Exception, SystemExit) as e:
+            print(f"❌ Batch job {index} ({result['trigger_id']}/{result['version_name']}) failed: {e}")
+            result["status"] = "failed"
+            result["error"] = str(e)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, args.batch_concurrency)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, kickoff, index, job) for index, job in enumerate(jobs, 1)]
+        results = [future.result() for future in futures]
+
+    to_wait = {r["run_id"]: r for r in results if r.get("wait") and r.get("run_id")}
+    if to_wait:
+        print(f"⏳ Polling {len(to_wait)} runs for completion...")
+
+        def on_complete(run_id, data):
+            r = to_wait[run_id]
+            r["status"] = "done"
+            r["outcome"] = data.get("outcome")
+            r["link"] = data.get("link") or r.get("link")
+            if r.get("download_reports"):
+                r["reports"] = download_reports(run_id, r["download_reports"], args.report_folder, r["client"])
+
+        wait_for_runs(
+            {run_id: r["client"] for run_id, r in to_wait.items()},
+            args.poll_timeout or args.poll_frequency * args.poll_max_attempts,
+            initial_interval=args.poll_initial_interval,
+            max_interval=args.poll_frequency,
+            on_complete=on_complete,
+        )
+        for r in to_wait.values():
+            if r["status"] != "done":
+                r["status"] = "timed_out"
+
+    for r in results:
+        r.pop("client", None)
+        r.pop("wait", None)
+        r.pop("download_reports", None)
+
+    print("\n📦 Batch summary:")
+    for r in results:
+        details = " ".join(str(part) for part in (r.get("run_id"), r.get("link") or r.get("error")) if part)
+        print(f"   [{r['job']}] {r['trigger_id']} / {r['version_name']}: {r['status']} {details}".rstrip())
+
+    if args.json_output_file:
+        with open(args.json_output_file, "w") as f:
+            json.dump({"jobs": results}, f)
+
+    return 1 if any(r["status"] in ("failed", "upload_failed", "timed_out") for r in results) else 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        sys.exit(run_batch(args))
+    run_kickoff(args)
+
+
+if __name__ == "__main__":
+    main()
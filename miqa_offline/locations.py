@@ -0,0 +1,195 @@
+import json
+import os
+import re
+import csv
+import stat
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CSV_NAME_COLUMNS = ("dataset", "sample", "name")
+CSV_SNIFF_BYTES = 64 * 1024
+
+def interpolate_env_variables(raw_string):
+    pattern = re.compile(r'\$\{\{\s*([\w\.]+)\s*\}\}|\$\{([\w\.]+)\}')
+    def replace_var(match):
+        var_name = match.group(1) or match.group(2)
+        return os.environ.get(var_name, match.group(0))
+    return pattern.sub(replace_var, raw_string)
+
+def parse_yaml_or_json(string_input):
+    try:
+        return json.loads(string_input)
+    except json.JSONDecodeError:
+        import yaml
+        return yaml.safe_load(string_input)
+
+def build_locations_from_parent_dir(parent: str, ds_id_mapping: dict, is_cloud: bool):
+    """
+    Return a dict {sample_name: location} by joining parent/<sample_name>.
+    For cloud: returns "s3://.../parent/<sample_name>" (or gs://...).
+    For local: returns os.path.join(parent, sample_name).
+    """
+    results = {}
+    if is_cloud:
+        # Expect parent like "s3://bucket/prefix" or "gs://bucket/prefix"
+        if not (parent.startswith("s3://") or parent.startswith("gs://")):
+            raise ValueError(f"Expected cloud parent to start with s3:// or gs://, got: {parent}")
+        scheme, rest = parent.split("://", 1)
+        bucket, *prefix_parts = rest.split("/", 1)
+        prefix = prefix_parts[0] if prefix_parts else ""
+        for sample_name in ds_id_mapping.keys():
+            child_prefix = f"{prefix.rstrip('/')}/{sample_name}" if prefix else sample_name
+            results[sample_name] = f"{scheme}://{bucket}/{child_prefix}"
+    else:
+        for sample_name in ds_id_mapping.keys():
+            results[sample_name] = os.path.join(parent, sample_name)
+    return results
+
+def iter_locations_from_csv(path):
+    """
+    Yield (sample_name, location) pairs from a CSV file one row at a time.
+    The dialect is sniffed once from the start of the file. A header row is
+    recognised by its column names; without one, rows must be `dataset,path`.
+    """
+    with open(path, newline="") as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        first = next(reader, None)
+        if first is None:
+            return
+
+        header = [column.strip() for column in first]
+        has_header = any(column in header for column in CSV_NAME_COLUMNS) and (
+            "path" in header or "output_folder" in header
+        )
+        if not has_header:
+            for row in itertools.chain([first], reader):
+                if not row:
+                    continue
+                if len(row) != 2:
+                    raise ValueError("CSV rows must have exactly two values: dataset,path")
+                yield row[0], row[1]
+            return
+
+        for row in reader:
+            if not row:
+                continue
+            record = dict(zip(header, row))
+            name = record.get("dataset") or record.get("sample") or record.get("name")
+            if not name:
+                raise ValueError("Missing dataset/sample/name column.")
+            if "output_folder" in record:
+                location = {
+                    "output_folder": record["output_folder"],
+                    "output_bucket": record.get("output_bucket"),
+                    "output_file_prefix": record.get("output_file_prefix"),
+                }
+                yield name, {k: v for k, v in location.items() if v}
+            else:
+                yield name, record["path"]
+
+def load_locations_from_file(path):
+    if path.endswith(".yaml") or path.endswith(".yml"):
+        import yaml
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+    elif path.endswith(".json"):
+        with open(path, "r") as f:
+            return json.load(f)
+    elif path.endswith(".csv"):
+        return dict(iter_locations_from_csv(path))
+    else:
+        raise ValueError(f"Unsupported file format: {path}")
+
+def convert_location_for_cloud(location_value, cloud_prefix=None):
+    """
+    Turn a cloud location into output_bucket/output_folder fields. Relative
+    paths are put under `cloud_prefix` (MIQA_CLOUD_PREFIX by default).
+    """
+    if cloud_prefix is None:
+        cloud_prefix = os.getenv("MIQA_CLOUD_PREFIX")
+    if isinstance(location_value, dict):
+        return location_value
+    if isinstance(location_value, str):
+        if cloud_prefix and not location_value.startswith("gs://") and not location_value.startswith("s3://"):
+            location_value = cloud_prefix.rstrip("/") + "/" + location_value.lstrip("/")
+        if location_value.startswith("gs://") or location_value.startswith("s3://"):
+            scheme, rest = location_value.split("://", 1)
+            parts = rest.split("/", 1)
+            if len(parts) == 2:
+                bucket = parts[0]
+                full_path = parts[1]
+                path_parts = full_path.rsplit("/", 1)
+                if len(path_parts) == 2 and "." in path_parts[1]:
+                    return {
+                        "output_bucket": bucket,
+                        "output_folder": path_parts[0],
+                        "output_file_prefix": path_parts[1]
+                    }
+                return {
+                    "output_bucket": bucket,
+                    "output_folder": full_path
+                }
+        return {"output_folder": location_value}
+    raise ValueError(f"Unrecognized location format: {location_value}")
+
+def resolve_local_location(location_value, docker_mode, default_parent_path, cwd=None):
+    """
+    Make a local location absolute: under the default parent in Docker mode,
+    else relative to `cwd` (the process's working directory by default).
+    """
+    if isinstance(location_value, str) and not os.path.isabs(location_value):
+        if docker_mode:
+            return os.path.join(default_parent_path, location_value)
+        return os.path.abspath(os.path.join(cwd, location_value) if cwd else location_value)
+    return location_value
+
+class PathStats:
+    """
+    Caches one os.stat() per path. prefetch() stats many paths concurrently,
+    which matters on network filesystems where each stat is a round trip.
+    """
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, path):
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def prefetch(self, paths, workers=16):
+        todo = [path for path in dict.fromkeys(paths) if path not in self._stats]
+        if not todo:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            results = list(pool.map(self._stat, todo))
+        with self._lock:
+            self._stats.update(zip(todo, results))
+
+    def stat(self, path):
+        with self._lock:
+            if path in self._stats:
+                return self._stats[path]
+        result = self._stat(path)
+        with self._lock:
+            self._stats[path] = result
+        return result
+
+    def exists(self, path):
+        return self.stat(path) is not None
+
+    def isfile(self, path):
+        st = self.stat(path)
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def isdir(self, path):
+        st = self.stat(path)
+        return st is not None and stat.S_ISDIR(st.st_mode)
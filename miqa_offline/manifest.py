@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from .cache import default_cache_dir
+from .console import format_bytes
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file, read through a reused buffer."""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+def build_dataset_manifest(path, previous=None, relpaths=None):
+    """
+    Build a manifest {"root": folder, "files": {relpath: {size, mtime_ns, sha256}}}
+    for a dataset folder or single file. Hashes from `previous` are reused for
+    files whose size and mtime are unchanged. A folder is walked unless its
+    `relpaths` are given.
+    """
+    if os.path.isfile(path):
+        root = os.path.dirname(path) or "."
+        relpaths = [os.path.basename(path)]
+    elif relpaths is not None:
+        root = path
+    else:
+        root = path
+        relpaths = [
+            os.path.relpath(os.path.join(dirpath, name), root)
+            for dirpath, _, filenames in os.walk(root)
+            for name in filenames
+            if not name.endswith(".DS_Store")
+        ]
+    previous_files = (previous or {}).get("files", {})
+    files = {}
+    for relpath in relpaths:
+        st = os.stat(os.path.join(root, relpath))
+        prior = previous_files.get(relpath)
+        if prior and prior["size"] == st.st_size and prior["mtime_ns"] == st.st_mtime_ns:
+            sha = prior["sha256"]
+        else:
+            sha = hash_file(os.path.join(root, relpath))
+        files[relpath] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+    return {"root": root, "files": files}
+
+def diff_manifest(manifest, previous, destination=None):
+    """
+    Split a manifest's files into (changed_relpaths, unchanged_bytes) relative to
+    the previous manifest. Nothing counts as unchanged if the previous upload
+    went to a different destination, since the files aren't there to reuse.
+    """
+    previous = previous or {}
+    if destination is not None and previous.get("destination") != destination:
+        previous = {}
+    previous_files = previous.get("files", {})
+    changed, unchanged_bytes = [], 0
+    for relpath, entry in manifest["files"].items():
+        prior = previous_files.get(relpath)
+        if prior and prior["sha256"] == entry["sha256"]:
+            unchanged_bytes += entry["size"]
+        else:
+            changed.append(relpath)
+    return changed, unchanged_bytes
+
+class UploadManifestStore:
+    """
+    Persists the manifest of the last successful upload for each dataset under
+    ~/.cache/miqa-offline/manifests, keyed by server, dataset ID and local path.
+    """
+    def __init__(self, miqa_server, cache_dir=None):
+        self.miqa_server = miqa_server
+        self.cache_dir = cache_dir or default_cache_dir("manifests")
+
+    def _path(self, dsid, location):
+        key = hashlib.sha256(f"{self.miqa_server}|{dsid}|{os.path.abspath(location)}".encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, dsid, location):
+        try:
+            with open(self._path(dsid, location)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, dsid, location, manifest):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self._path(dsid, location))
+        except OSError as e:
+            print(f"⚠️ Could not write upload manifest for dataset {dsid}: {e}")
+
+def plan_incremental_uploads(locations_lookup_by_sid, manifest_store, destinations=None):
+    """
+    Print how much an incremental upload would send versus skip, without
+    uploading. A file can only be skipped if its previous upload went to the
+    same execution folder, so `destinations` ({dsid: {"bucket", "key"}}) should
+    hold the executions of the run being resumed; without it the upload goes
+    to a new run, whose executions start empty, and everything is sent.
+    """
+    destinations = destinations or {}
+    total_sent = total_skipped = 0
+    for dsid, path in locations_lookup_by_sid.items():
+        if not os.path.exists(path):
+            continue
+        previous = manifest_store.load(dsid, path)
+        manifest = build_dataset_manifest(path, previous)
+        changed, unchanged_bytes = diff_manifest(manifest, previous, destinations.get(dsid, {}))
+        changed_bytes = sum(manifest["files"][relpath]["size"] for relpath in changed)
+        total_sent += changed_bytes
+        total_skipped += unchanged_bytes
+        print(
+            f"   {dsid}: {len(changed)}/{len(manifest['files'])} files changed, "
+            f"{format_bytes(changed_bytes)} to send, {format_bytes(unchanged_bytes)} unchanged"
+        )
+    print(f"🧮 Incremental dry run: would send {format_bytes(total_sent)} and save {format_bytes(total_skipped)}")
+    if not destinations:
+        print("   A new run uploads to new executions, so nothing can be skipped; only --resume-run-id reuses earlier uploads.")
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from .api import apply_run_metadata
+from .polling import poll_for_completion_async
+from .timings import Timings
+
+async def _gather_or_cancel(*coros):
+    """Like asyncio.gather, but cancels the remaining tasks as soon as one fails."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def run_post_trigger_async(args, client, run_id, locations_lookup_by_sid, manifest_store, set_metadata_dict, path_stats=None, timings=None, upload_scan=None):
+    """
+    Run the post-trigger phases concurrently: uploads (followed by polling) run
+    alongside the metadata and version override calls. Returns
+    (upload_results, poll_successful). Phase spans are recorded in `timings`
+    if given; `upload_scan` is the scan stage's result, passed to the uploads.
+    """
+    timings = timings or Timings()
+
+    async def upload_then_poll():
+        upload_results = []
+        if not args.outputs_already_on_cloud:
+            from .uploads import bundle_policy_from_args, chunked_upload_from_args, report_failed_uploads, upload_datasets
+            uploads_started = time.time()
+            if args.watch:
+                from .watch import watch_and_upload, watch_policy_from_args
+                upload_results = await asyncio.to_thread(
+                    watch_and_upload,
+                    run_id,
+                    client.miqa_server,
+                    locations_lookup_by_sid,
+                    args.api_key,
+                    watch_policy_from_args(args),
+                    workers=args.upload_workers,
+                    rate_limiter=client.rate_limiter,
+                )
+            else:
+                upload_results = await asyncio.to_thread(
+                    upload_datasets,
+                    run_id,
+                    client.miqa_server,
+                    locations_lookup_by_sid,
+                    args.api_key,
+                    workers=args.upload_workers,
+                    manifest_store=manifest_store,
+                    path_stats=path_stats,
+                    bundle_policy=bundle_policy_from_args(args),
+                    chunked_upload=chunked_upload_from_args(args, client.miqa_server),
+                    rate_limiter=client.rate_limiter,
+                    upload_scan=upload_scan,
+                )
+            timings.add("uploads", uploads_started, time.time() - uploads_started, bytes=sum(r.get("bytes", 0) for r in upload_results))
+            timings.add_upload_results(upload_results)
+            report_failed_uploads(upload_results)
+        if not args.wait_for_completion:
+            return upload_results, True
+        print("⏳ Polling for completion...")
+        fixed = args.poll_mode == "fixed"
+        polling_started = time.time()
+        poll_successful = await poll_for_completion_async(
+            run_id,
+            client,
+            args.poll_timeout or args.poll_frequency * args.poll_max_attempts,
+            initial_interval=args.poll_frequency if fixed else args.poll_initial_interval,
+            max_interval=args.poll_frequency,
+            debug=args.debug,
+        )
+        timings.add("polling", polling_started, time.time() - polling_started)
+        return upload_results, poll_successful
+
+    def apply_metadata():
+        with timings.phase("metadata"):
+            apply_run_metadata(args, client, run_id, set_metadata_dict)
+
+    (upload_results, poll_successful), _ = await _gather_or_cancel(
+        upload_then_poll(),
+        asyncio.to_thread(apply_metadata),
+    )
+    return upload_results, poll_successful
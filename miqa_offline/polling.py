@@ -0,0 +1,174 @@
+import asyncio
+import json
+import random
+import time
+
+import requests
+
+from .client import _retry_after_seconds
+
+def poll_for_completion(run_id, client, max_checks, frequency_seconds):
+    status_url = f"test_chain_run/{run_id}/get_status"
+    for attempt in range(1, max_checks + 1):
+        try:
+            response = client.get(status_url)
+        except requests.RequestException as e:
+            print(f"⚠️ Status request failed on attempt {attempt}: {e}")
+            if attempt < max_checks:
+                time.sleep(frequency_seconds)
+            continue
+        try:
+            json_res = response.json()
+        except Exception as e:
+            print(f"⚠️ Failed to parse response on attempt {attempt}: {e}")
+            continue
+
+        print(f"[Attempt {attempt}] Status:")
+        print(json.dumps(json_res, indent=2))
+
+        status = json_res.get("data", {}).get("status")
+        if status == "done":
+            print(f"✅ Miqa run {run_id} completed.")
+            print(f"📊 Outcome: {json_res.get('data', {}).get('outcome')}")
+            print(f"🔗 Link: {json_res.get('data', {}).get('link')}")
+            return True
+        if attempt < max_checks:
+            time.sleep(frequency_seconds)
+    print(f"⏳ Reached max attempts ({max_checks}) without completion.")
+    return False
+
+class AdaptivePoller:
+    """
+    Tracks one run's status with adaptive intervals: they start at
+    `initial_interval` and back off (with jitter) up to `max_interval`; a server
+    Retry-After takes precedence. Only status transitions are printed.
+    """
+    def __init__(self, run_id, client, timeout_seconds, initial_interval=5, max_interval=60, debug=False):
+        self.run_id = run_id
+        self.client = client
+        self.timeout_seconds = timeout_seconds
+        self.max_interval = max_interval
+        self.debug = debug
+        self.started = time.time()
+        self.deadline = self.started + timeout_seconds
+        self.interval = initial_interval
+        self.last_status = None
+        self.last_response = None
+
+    def check(self):
+        """Fetch the status once. Returns True when the run is done."""
+        self.last_response = None
+        try:
+            self.last_response = self.client.get(f"test_chain_run/{self.run_id}/get_status")
+            json_res = self.last_response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Status check failed: {e}")
+            return False
+
+        if self.debug:
+            print(json.dumps(json_res, indent=2))
+        data = json_res.get("data", {})
+        status = data.get("status")
+        if status != self.last_status:
+            print(f"⏳ [{int(time.time() - self.started)}s] Status: {status}")
+            self.last_status = status
+        if status == "done":
+            print(f"✅ Miqa run {self.run_id} completed.")
+            print(f"📊 Outcome: {data.get('outcome')}")
+            print(f"🔗 Link: {data.get('link')}")
+            return True
+        return False
+
+    def next_delay(self):
+        """Seconds to wait before the next check, or None once the deadline has passed."""
+        remaining = self.deadline - time.time()
+        if remaining <= 0:
+            print(f"⏳ Reached poll timeout ({self.timeout_seconds}s) without completion.")
+            return None
+        delay = _retry_after_seconds(self.last_response)
+        if delay is None:
+            delay = self.interval * random.uniform(0.8, 1.2)
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return min(delay, remaining)
+
+def poll_for_completion_adaptive(run_id, client, timeout_seconds, initial_interval=5, max_interval=60, debug=False):
+    """Poll until the run is done or `timeout_seconds` have elapsed (see AdaptivePoller)."""
+    poller = AdaptivePoller(run_id, client, timeout_seconds, initial_interval, max_interval, debug)
+    while not poller.check():
+        delay = poller.next_delay()
+        if delay is None:
+            return False
+        time.sleep(delay)
+    return True
+
+async def poll_for_completion_async(run_id, client, timeout_seconds, initial_interval=5, max_interval=60, debug=False):
+    """Async variant of poll_for_completion_adaptive; cancelling it stops polling immediately."""
+    poller = AdaptivePoller(run_id, client, timeout_seconds, initial_interval, max_interval, debug)
+    while not await asyncio.to_thread(poller.check):
+        delay = poller.next_delay()
+        if delay is None:
+            return False
+        await asyncio.sleep(delay)
+    return True
+
+async def _track_run(run_id, client, started, deadline, initial_interval, max_interval, checks):
+    """Poll one run with its own adaptive interval until it is done (returns its status data) or the deadline passes (None)."""
+    interval = initial_interval
+    last_status = None
+    while True:
+        response = data = None
+        async with checks:
+            try:
+                response = await asyncio.to_thread(client.get, f"test_chain_run/{run_id}/get_status")
+                data = response.json().get("data", {})
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️ Status check failed for run {run_id}: {e}")
+        if data is not None:
+            status = data.get("status")
+            if status != last_status:
+                print(f"⏳ [{int(time.time() - started)}s] Run {run_id}: {status}")
+                last_status = status
+            if status == "done":
+                print(f"✅ Miqa run {run_id} completed. Outcome: {data.get('outcome')}")
+                return data
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = interval * random.uniform(0.8, 1.2)
+            interval = min(max_interval, interval * 1.5)
+        await asyncio.sleep(min(delay, remaining))
+
+async def wait_for_runs_async(clients_by_run_id, timeout_seconds, initial_interval=5, max_interval=60, on_complete=None, max_concurrent_checks=8):
+    """
+    Track several runs in one event loop, each with its own adaptive interval,
+    until all are done or the deadline passes. At most `max_concurrent_checks`
+    status requests are in flight at once. `on_complete(run_id, data)` runs in
+    a worker thread as soon as each run is done, while the others keep being
+    polled. Returns {run_id: status data} for every run that completed.
+    """
+    started = time.time()
+    deadline = started + timeout_seconds
+    checks = asyncio.Semaphore(max(1, max_concurrent_checks))
+    completed = {}
+
+    async def track(run_id, client):
+        data = await _track_run(run_id, client, started, deadline, initial_interval, max_interval, checks)
+        if data is None:
+            return
+        completed[run_id] = data
+        if on_complete:
+            await asyncio.to_thread(on_complete, run_id, data)
+
+    await asyncio.gather(*(track(run_id, client) for run_id, client in clients_by_run_id.items()))
+    pending = [run_id for run_id in clients_by_run_id if run_id not in completed]
+    if pending:
+        print(f"⏳ Reached poll timeout ({timeout_seconds}s) with {len(pending)} run(s) still pending: {', '.join(map(str, pending))}")
+    return completed
+
+def wait_for_runs(clients_by_run_id, timeout_seconds, initial_interval=5, max_interval=60, on_complete=None, max_concurrent_checks=8):
+    """Blocking wrapper around wait_for_runs_async. Returns {run_id: status data} for every run that completed."""
+    return asyncio.run(
+        wait_for_runs_async(clients_by_run_id, timeout_seconds, initial_interval, max_interval, on_complete, max_concurrent_checks)
+    )
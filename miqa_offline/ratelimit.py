@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: limits still apply within this process.
+    fcntl = None
+
+from .cache import default_cache_dir
+
+class SharedRateLimiter:
+    """
+    A token bucket plus concurrency slots for Miqa traffic, shared by every
+    miqa-offline process on the machine that talks to the same server.
+
+    Bucket state lives in a small JSON file updated under an exclusive flock;
+    each concurrency slot is a lock file, so slots held by a process that dies
+    are released by the OS. A 429 from any process pauses everyone for the
+    Retry-After period and halves the shared rate, which then recovers
+    linearly over `recovery_seconds`.
+    """
+    POLL_SECONDS = 0.05
+
+    def __init__(self, miqa_server, rate, burst=None, max_concurrent=None, state_dir=None, recovery_seconds=60.0):
+        self.rate = float(rate) if rate else 0.0
+        self.burst = float(burst or max(1.0, 2 * self.rate))
+        self.max_concurrent = max_concurrent or {}
+        self.recovery_seconds = recovery_seconds
+        key = hashlib.sha256(miqa_server.encode()).hexdigest()[:16]
+        self.state_dir = os.path.join(state_dir or default_cache_dir("ratelimit"), key)
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.state_path = os.path.join(self.state_dir, "bucket.json")
+        self._thread_lock = threading.Lock()
+        self._semaphores = {kind: threading.BoundedSemaphore(limit) for kind, limit in self.max_concurrent.items() if limit}
+
+    @contextmanager
+    def _locked_state(self):
+        with self._thread_lock, open(self.state_path, "a+") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _effective_rate(self, state, now):
+        scale = state.get("scale", 1.0)
+        if scale < 1.0:
+            scale = min(1.0, scale + (now - state.get("throttled_at", now)) / self.recovery_seconds * (1.0 - scale))
+        return self.rate * scale
+
+    def acquire(self):
+        """Block until a token is available (and no 429 cooldown is in effect), then take it."""
+        if not self.rate:
+            return
+        while True:
+            now = time.time()
+            with self._locked_state() as state:
+                rate = self._effective_rate(state, now)
+                tokens = min(self.burst, state.get("tokens", self.burst) + (now - state.get("updated", now)) * rate)
+                state["tokens"], state["updated"] = tokens, now
+                cooldown = state.get("cooldown_until", 0) - now
+                if cooldown <= 0 and tokens >= 1:
+                    state["tokens"] = tokens - 1
+                    return
+            wait = cooldown if cooldown > 0 else (1 - tokens) / max(rate, 1e-6)
+            # Jitter so processes woken at the same time don't all collide again.
+            time.sleep(max(self.POLL_SECONDS, wait) * random.uniform(1.0, 1.2))
+
+    def throttled(self, retry_after=None):
+        """Record a 429: pause all processes for `retry_after` seconds and halve the shared rate."""
+        now = time.time()
+        with self._locked_state() as state:
+            state["scale"] = max(0.1, 0.5 * (self._effective_rate(state, now) / self.rate if self.rate else 1.0))
+            state["throttled_at"] = now
+            state["tokens"] = 0
+            state["updated"] = now
+            state["cooldown_until"] = max(state.get("cooldown_until", 0), now + (retry_after or 1.0))
+
+    @contextmanager
+    def slot(self, kind):
+        """Hold one of `max_concurrent[kind]` slots shared across processes for the duration of the block."""
+        limit = self.max_concurrent.get(kind)
+        if not limit or fcntl is None:
+            semaphore = self._semaphores.get(kind)
+            if semaphore is None:
+                yield
+                return
+            with semaphore:
+                yield
+            return
+        while True:
+            for index in range(limit):
+                f = open(os.path.join(self.state_dir, f"{kind}-{index}.lock"), "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    f.close()
+            else:
+                time.sleep(self.POLL_SECONDS * random.uniform(1.0, 2.0))
+                continue
+            break
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+def rate_limiter_from_args(args, miqa_server):
+    if not (args.rate_limit or args.max_concurrent_requests or args.max_concurrent_uploads):
+        return None
+    return SharedRateLimiter(
+        miqa_server,
+        args.rate_limit,
+        burst=args.rate_limit_burst,
+        max_concurrent={"api": args.max_concurrent_requests, "upload": args.max_concurrent_uploads},
+        state_dir=args.rate_limit_dir,
+    )
@@ -0,0 +1,88 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .console import format_bytes
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def download_report(run_id, report_type, output_folder, client):
+    """
+    Stream a report to `<report>.part` and atomically rename it into place once
+    complete. If a `.part` file is left over from an interrupted download, resume
+    it with an HTTP Range request when the server supports it.
+    Returns a result dict with the bytes written and throughput.
+    """
+    report_url = client.url(f"test_chain_run/{run_id}/{report_type}")
+    report_path = os.path.join(output_folder, f"Miqa_Test_Report_{run_id}.{report_type}")
+    part_path = report_path + ".part"
+    result = {"report_type": report_type, "path": report_path, "bytes": 0}
+
+    # ✅ Ensure the folder exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    started = time.time()
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with client.get(report_url, headers=headers, stream=True) as response:
+                if response.status_code == 416 and offset:
+                    # Range not satisfiable: either the part file already holds the whole
+                    # report, or it is stale and we start over. Neither uses up a retry.
+                    if _content_range_total(response) == offset:
+                        break
+                    os.remove(part_path)
+                    continue
+                if not response.ok:
+                    print(f"❌ Failed to download {report_type.upper()} report from {report_url}. Status: {response.status_code}")
+                    result["status"] = "failed"
+                    result["error"] = f"HTTP {response.status_code}"
+                    return result
+                resumed = offset and response.status_code == 206
+                if not resumed:
+                    # The server sent the whole report again, so bytes from earlier attempts were thrown away.
+                    result["bytes"] = 0
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        result["bytes"] += len(chunk)
+            break
+        except requests.RequestException as e:
+            if attempt == client.max_retries:
+                print(f"❌ Failed to download {report_type.upper()} report from {report_url}: {e}")
+                result["status"] = "failed"
+                result["error"] = str(e)
+                return result
+            attempt += 1
+            print(f"⚠️ {report_type.upper()} report download interrupted ({e}); resuming...")
+
+    os.replace(part_path, report_path)
+    seconds = max(time.time() - started, 1e-6)
+    result.update({
+        "status": "success",
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(result["bytes"] / (1024 * 1024) / seconds, 3),
+    })
+    print(f"📥 Report saved to {report_path} ({format_bytes(result['bytes'])} at {result['mb_per_s']} MB/s)")
+    return result
+
+def _content_range_total(response):
+    """Return the full size from a `Content-Range: bytes */<size>` header, or None if absent."""
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+def download_reports(run_id, report_types, output_folder, client):
+    """Download all requested report types concurrently."""
+    if not report_types:
+        return []
+    with ThreadPoolExecutor(max_workers=len(report_types)) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, download_report, run_id, report_type, output_folder, client)
+            for report_type in report_types
+        ]
+        return [future.result() for future in futures]
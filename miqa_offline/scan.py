@@ -0,0 +1,138 @@
+import contextvars
+import fnmatch
+import heapq
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from .console import format_bytes
+
+LARGEST_FILES = 5
+
+class ScanPolicy:
+    """
+    Include/exclude glob patterns for dataset files. A pattern matches a
+    file's path relative to the dataset folder or its bare name, so both
+    '*.vcf' and 'logs/*' work. With include patterns, only matching files are
+    uploaded; exclude patterns win over include patterns.
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+
+    def _matches(self, patterns, relpath):
+        name = os.path.basename(relpath)
+        return any(fnmatch.fnmatch(relpath, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    def allows(self, relpath):
+        if self.include and not self._matches(self.include, relpath):
+            return False
+        return not self._matches(self.exclude, relpath)
+
+def scan_dataset(path, policy=None, path_stats=None):
+    """
+    Walk one dataset path with os.scandir. Returns {"path", "missing",
+    "is_file", "files": [(relpath, size)], "bytes", "excluded",
+    "largest": [(relpath, size)]}; a path that doesn't exist (or isn't a file
+    or folder) is returned with "missing" set and no files. A single-file
+    dataset is never filtered.
+    """
+    if path_stats is not None:
+        st = path_stats.stat(path)
+    else:
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+    if st is not None and stat.S_ISREG(st.st_mode):
+        files = [(os.path.basename(path), st.st_size)]
+        return {"path": path, "missing": False, "is_file": True, "files": files, "bytes": st.st_size, "excluded": 0, "largest": files}
+    if st is None or not stat.S_ISDIR(st.st_mode):
+        return {"path": path, "missing": True, "is_file": False, "files": [], "bytes": 0, "excluded": 0, "largest": []}
+
+    files = []
+    excluded = 0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                # Symlinked folders aren't descended into, as in miqatools' os.walk: they
+                # can loop or point outside the dataset. Symlinked files are uploaded.
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=True) and not entry.name.endswith(".DS_Store"):
+                    relpath = os.path.relpath(entry.path, path)
+                    if policy is None or policy.allows(relpath):
+                        files.append((relpath, entry.stat().st_size))
+                    else:
+                        excluded += 1
+    files.sort()
+    return {
+        "path": path,
+        "missing": False,
+        "is_file": False,
+        "files": files,
+        "bytes": sum(size for _, size in files),
+        "excluded": excluded,
+        "largest": heapq.nlargest(LARGEST_FILES, files, key=lambda item: item[1]),
+    }
+
+def scan_datasets(locations_lookup_by_sid, policy=None, workers=16, path_stats=None):
+    """
+    Scan every dataset path concurrently. Returns {dsid: scan} (see
+    scan_dataset), including missing paths; folders that can't be read are
+    reported and left out, so their upload falls back to walking the folder.
+    """
+    items = [(dsid, path) for dsid, path in locations_lookup_by_sid.items() if isinstance(path, str)]
+    if not items:
+        return {}
+
+    def scan(item):
+        dsid, path = item
+        try:
+            return dsid, scan_dataset(path, policy, path_stats)
+        except OSError as e:
+            print(f"⚠️ Could not scan {path} for dataset {dsid}: {e}")
+            return dsid, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, scan, item) for item in items]
+        return {dsid: result for dsid, result in (future.result() for future in futures) if result is not None}
+
+def scan_policy_from_args(args):
+    if not (args.include_files or args.exclude_files):
+        return None
+    return ScanPolicy(include=args.include_files, exclude=args.exclude_files)
+
+def print_upload_plan(upload_scan, locations_lookup_by_sid, sample_names_by_sid=None, preview=20):
+    """Print the estimated transfer from a scan: totals, the largest datasets and the largest files."""
+    sample_names_by_sid = sample_names_by_sid or {}
+    missing = sum(1 for scan in upload_scan.values() if scan["missing"])
+    upload_scan = {dsid: scan for dsid, scan in upload_scan.items() if not scan["missing"]}
+    total_files = sum(len(scan["files"]) for scan in upload_scan.values())
+    total_bytes = sum(scan["bytes"] for scan in upload_scan.values())
+    excluded = sum(scan["excluded"] for scan in upload_scan.values())
+    unreadable = len(locations_lookup_by_sid) - len(upload_scan) - missing
+
+    print(
+        f"🧮 Upload plan: {len(upload_scan)} datasets, {total_files} files, {format_bytes(total_bytes)}"
+        + (f" ({excluded} files excluded by pattern)" if excluded else "")
+        + (f"; {missing} dataset paths not found" if missing else "")
+        + (f"; {unreadable} could not be scanned" if unreadable else "")
+    )
+    by_size = sorted(upload_scan.items(), key=lambda item: item[1]["bytes"], reverse=True)
+    print("   Largest datasets (uploaded first):")
+    for dsid, scan in by_size[:preview]:
+        label = f"{sample_names_by_sid[dsid]} ({dsid})" if dsid in sample_names_by_sid else str(dsid)
+        print(f"   {label}: {len(scan['files'])} files, {format_bytes(scan['bytes'])}")
+    if len(by_size) > preview:
+        print(f"   ... and {len(by_size) - preview} more")
+    largest = heapq.nlargest(
+        LARGEST_FILES,
+        ((os.path.join(scan["path"], relpath) if not scan["is_file"] else scan["path"], size) for scan in upload_scan.values() for relpath, size in scan["largest"]),
+        key=lambda item: item[1],
+    )
+    if largest:
+        print("   Largest files:")
+        for path, size in largest:
+            print(f"   {format_bytes(size):>10}  {path}")
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Timings:
+    """
+    Records wall-clock spans for the phases of a kickoff (and per-dataset
+    uploads) plus the Miqa client's HTTP request and retry counts. Exported as
+    the `timings` section of the JSON summary and as a Chrome trace.
+    """
+    def __init__(self, client=None):
+        self.client = client
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._http_start = self._http_counts()
+
+    def _http_counts(self):
+        if self.client is None:
+            return (0, 0)
+        return (self.client.request_count, self.client.retry_count)
+
+    def add(self, name, start, seconds, category="phase", **attrs):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "category": category,
+                "start": start,
+                "seconds": seconds,
+                "thread": threading.get_ident(),
+                "attrs": attrs,
+            })
+
+    @contextmanager
+    def phase(self, name, **attrs):
+        start = time.time()
+        try:
+            yield attrs
+        finally:
+            self.add(name, start, time.time() - start, **attrs)
+
+    def add_upload_results(self, upload_results):
+        for result in upload_results:
+            if "started_at" not in result:
+                continue
+            attrs = {k: result[k] for k in ("ds_id", "status", "files", "bytes", "mb_per_s") if k in result}
+            self.add(f"upload {result['ds_id']}", result["started_at"], result["seconds"], category="upload", **attrs)
+
+    def summary(self):
+        requests_made, retries = self._http_counts()
+        phases = {}
+        for span in self.spans:
+            if span["category"] == "phase":
+                phases[span["name"]] = phases.get(span["name"], 0) + span["seconds"]
+        uploads = [dict(span["attrs"], seconds=round(span["seconds"], 3)) for span in self.spans if span["category"] == "upload"]
+        return {
+            "total_seconds": round(time.time() - self.started, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in phases.items()},
+            "uploads": uploads,
+            "http": {"requests": requests_made - self._http_start[0], "retries": retries - self._http_start[1]},
+        }
+
+    def write_chrome_trace(self, path):
+        """Write the spans in Chrome trace event format (chrome://tracing, Perfetto)."""
+        origin = min([self.started] + [span["start"] for span in self.spans])
+        events = [
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": int((span["start"] - origin) * 1e6),
+                "dur": int(span["seconds"] * 1e6),
+                "pid": os.getpid(),
+                "tid": span["thread"],
+                "args": span["attrs"],
+            }
+            for span in self.spans
+        ]
+        counts = self.summary()["http"]
+        events.append({"name": "http", "ph": "C", "ts": int((time.time() - origin) * 1e6), "pid": os.getpid(), "args": counts})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
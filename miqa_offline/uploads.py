@@ -0,0 +1,499 @@
+import asyncio
+import contextvars
+import os
+import random
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from miqatools.remoteexecution.triggertestandupload_python import upload_to_test_by_dsid
+from miqatools.remoteexecution.triggertest_helpers import get_tcr_info_json, update_execution_start_time
+from miqatools.remoteexecution.executionhelpers import complete_exec, get_exec_info
+from miqatools.remoteexecution.baseuploadhelpers import get_remote_url, get_upload_url, get_user_log_post_url
+
+from .bundle import BundlePolicy, TarStream, list_bundle_files, multipart_form_stream
+from .chunked import RETRYABLE_STATUS_CODES, UploadCheckpointStore, aligned_chunk_size, describe_progress, query_upload_offset, send_chunks
+from .client import _retry_after_seconds
+from .console import format_bytes
+from .manifest import build_dataset_manifest, diff_manifest
+
+COMPLETED_EXEC_STATUSES = ("done", "failed", "cancelled")
+UPLOAD_RETRIES = 4
+UPLOAD_BACKOFF_MAX = 30.0
+
+def _complete_exec(exec_id, miqa_server, api_key, failed=False):
+    return _retrying(f"Completing execution {exec_id}", complete_exec, exec_id, miqa_server, quiet=False, api_key=api_key, failed=failed)
+
+def _retrying(what, fn, *args, **kwargs):
+    """
+    Call one of miqatools' execution helpers. They are idempotent GETs that
+    raise on any error and never retry, so retry them like _upload_request.
+    """
+    for attempt in range(UPLOAD_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == UPLOAD_RETRIES:
+                raise
+            delay = min(UPLOAD_BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ {what} failed ({str(e)[:200]}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def _start_execution(run_id, miqa_server, dsid, source_location, api_key):
+    """
+    Look up the execution for a dataset in this run and mark it as started.
+    Returns (exec_id, exec_info), with exec_info None if the execution is
+    already complete and should be skipped.
+    """
+    info = _retrying(f"Execution lookup for dataset {dsid}", get_tcr_info_json, miqa_server, run_id, source_location, ds_id=dsid, api_key=api_key)
+    exec_id = info.get("exec_id")
+    if (info.get("exec_status") or "").lower() in COMPLETED_EXEC_STATUSES:
+        print(f"Skipping upload for {exec_id}: status is already {info.get('exec_status')}")
+        return exec_id, None
+    update_execution_start_time(miqa_server, exec_id, api_key=api_key, quiet=False)
+    return exec_id, _retrying(f"Execution info for {exec_id}", get_exec_info, exec_id, miqa_server, api_key=api_key)
+
+def _upload_request(send, what):
+    """
+    Call send(), which makes one HTTP request, until it gets a 2xx response.
+    Connection errors and 408/429/5xx responses are retried up to
+    UPLOAD_RETRIES times with jittered exponential backoff (or the server's
+    Retry-After); any other status raises straight away.
+    """
+    for attempt in range(UPLOAD_RETRIES + 1):
+        is_last = attempt == UPLOAD_RETRIES
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if is_last:
+                raise
+            delay = min(UPLOAD_BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ {what} failed ({e.__class__.__name__}); retrying in {delay:.1f}s...")
+        else:
+            if response.ok:
+                return response
+            if is_last or response.status_code not in RETRYABLE_STATUS_CODES:
+                raise Exception(f"{what} failed with status {response.status_code}: {response.text[:500]}")
+            retry_after = _retry_after_seconds(response)
+            delay = min(UPLOAD_BACKOFF_MAX, retry_after if retry_after is not None else 2 ** attempt * random.uniform(0.5, 1.5))
+            print(f"⚠️ {what} returned {response.status_code}; retrying in {delay:.1f}s...")
+            response.close()
+        time.sleep(delay)
+
+def _send_file(exec_info, root, relpath, miqa_server, api_key):
+    """
+    Upload one file of a dataset into its execution's folder, keeping its
+    subfolder. Unlike miqatools' upload_file, which only prints the storage
+    response, this retries transient failures and raises if the upload is
+    rejected.
+    """
+    filepath = os.path.join(root, relpath)
+    cloud_provider = exec_info.get("cloud_provider", "aws")
+    remote_url = get_remote_url(
+        exec_info.get("bucket"),
+        filepath,
+        miqa_server,
+        "/".join(filter(None, [exec_info.get("key"), os.path.dirname(relpath).replace(os.sep, "/")])),
+        cloud_provider=cloud_provider,
+        org_config_id=exec_info.get("org_config_id"),
+        api_key=api_key,
+    )
+    auth_headers = {"app_key": api_key} if api_key else {}
+    url = _upload_request(lambda: requests.get(remote_url, headers=auth_headers), f"Upload URL for {relpath}").json().get("url")
+
+    def send():
+        with open(filepath, "rb") as f:
+            if cloud_provider == "google":
+                size = os.fstat(f.fileno()).st_size
+                headers = dict(auth_headers, **{"Content-Length": str(size), "Content-Type": "text/plain"})
+                # requests sends an empty file object chunked, which conflicts with the Content-Length.
+                return requests.put(url, data=f if size else b"", headers=headers)
+            return requests.post(url["url"], data=url.get("fields", {}), files={"file": (filepath, f)})
+
+    _upload_request(send, f"Upload of {relpath}")
+
+def _post_upload_log(run_id, exec_id, miqa_server, files, seconds, api_key):
+    """Post the per-dataset upload summary that miqatools' folder upload sends to the run's user logs."""
+    data = {
+        "tcr_id": run_id,
+        "exec_id": exec_id,
+        "filesizes": {os.path.basename(relpath): f"{round(size / (1024 * 1024), 5)}MB" for relpath, size in files},
+        "total_time": seconds,
+    }
+    try:
+        response = requests.post(get_user_log_post_url(miqa_server, run_id), json=data, headers={"app_key": api_key} if api_key else {})
+        print(f"Posted summary to Miqa with status {response.status_code}")
+    except Exception:
+        print("Unable to post summary to Miqa")
+
+def upload_dataset_incremental(run_id, miqa_server, dsid, path, api_key, manifest_store, relpaths=None):
+    """
+    Upload only the files of a dataset that are new or changed since the last
+    successful upload to the same destination. `relpaths` (from the scan
+    stage) saves walking the folder again. Returns
+    (files_sent, bytes_sent, bytes_skipped).
+    """
+    previous = manifest_store.load(dsid, path)
+    manifest = build_dataset_manifest(path, previous, relpaths)
+
+    exec_id, exec_info = _start_execution(run_id, miqa_server, dsid, manifest["root"], api_key)
+    if exec_info is None:
+        return 0, 0, 0
+    destination = {"bucket": exec_info.get("bucket"), "key": exec_info.get("key")}
+    changed, unchanged_bytes = diff_manifest(manifest, previous, destination)
+    print(
+        f"Dataset {dsid}: uploading {len(changed)} of {len(manifest['files'])} files "
+        f"(skipping {format_bytes(unchanged_bytes)} unchanged)"
+        + (" - the last upload went to another execution" if previous and previous.get("destination") != destination else "")
+    )
+
+    sent = []
+    failed = False
+    try:
+        for relpath in changed:
+            _send_file(exec_info, manifest["root"], relpath, miqa_server, api_key)
+            sent.append(relpath)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        # Only record files that reached Miqa, so a failed one is sent again next time.
+        unsent = set(changed).difference(sent)
+        manifest["files"] = {relpath: entry for relpath, entry in manifest["files"].items() if relpath not in unsent}
+        manifest["destination"] = destination
+        manifest_store.save(dsid, path, manifest)
+        _complete_exec(exec_id, miqa_server, api_key, failed=failed)
+    return len(sent), sum(manifest["files"][relpath]["size"] for relpath in sent), unchanged_bytes
+
+def execution_destinations(run_id, miqa_server, locations_lookup_by_sid, api_key):
+    """Look up, without starting them, where each dataset's execution in an existing run stores its uploads."""
+    destinations = {}
+    for dsid, path in locations_lookup_by_sid.items():
+        info = _retrying(f"Execution lookup for dataset {dsid}", get_tcr_info_json, miqa_server, run_id, path, ds_id=dsid, api_key=api_key)
+        exec_info = _retrying(f"Execution info for {info.get('exec_id')}", get_exec_info, info.get("exec_id"), miqa_server, api_key=api_key)
+        destinations[dsid] = {"bucket": exec_info.get("bucket"), "key": exec_info.get("key")}
+    return destinations
+
+def upload_dataset_files(run_id, miqa_server, dsid, path, files, api_key, workers=8):
+    """
+    Upload a given list of a dataset folder's files (e.g. from the scan stage,
+    after include/exclude patterns), up to `workers` at a time, failing on the
+    first rejected upload. Returns the number of bytes sent.
+    """
+    exec_id, exec_info = _start_execution(run_id, miqa_server, dsid, path, api_key)
+    if exec_info is None:
+        return 0
+    print(f"Dataset {dsid}: uploading {len(files)} files ({format_bytes(sum(size for _, size in files))})")
+
+    started = time.time()
+    failed = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files)))) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _send_file, exec_info, path, relpath, miqa_server, api_key)
+                for relpath, _ in files
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            finally:
+                # After a failure, don't start the files still queued.
+                for future in futures:
+                    future.cancel()
+    except Exception:
+        failed = True
+        raise
+    finally:
+        _post_upload_log(run_id, exec_id, miqa_server, files, time.time() - started, api_key)
+        _complete_exec(exec_id, miqa_server, api_key, failed=failed)
+    return sum(size for _, size in files)
+
+def upload_dataset_bundle(run_id, miqa_server, dsid, path, files, api_key):
+    """
+    Upload a dataset folder as a single tar archive, streamed straight from the
+    source files in one request. The execution's outputs are then that one
+    <folder>.tar: Miqa doesn't extract it. Returns the number of bytes sent.
+    """
+    exec_id, exec_info = _start_execution(run_id, miqa_server, dsid, path, api_key)
+    if exec_info is None:
+        return 0
+    stream = TarStream(path, files)
+    bundle_name = f"{os.path.basename(os.path.normpath(path))}.tar"
+    cloud_provider = exec_info.get("cloud_provider", "aws")
+    print(f"Dataset {dsid}: uploading {len(files)} files as one {format_bytes(len(stream))} tarball ({bundle_name}, stored unextracted)")
+
+    failed = False
+    try:
+        url = get_upload_url(
+            exec_info.get("bucket"),
+            bundle_name,
+            miqa_server,
+            exec_info.get("key"),
+            cloud_provider=cloud_provider,
+            org_config_id=exec_info.get("org_config_id"),
+            api_key=api_key,
+        )
+        if cloud_provider == "google":
+            response = requests.put(url, data=stream, headers={"Content-Type": "application/x-tar"})
+        else:
+            body, content_type = multipart_form_stream(url.get("fields", {}), bundle_name, stream)
+            response = requests.post(url["url"], data=body, headers={"Content-Type": content_type})
+        if not response.ok:
+            raise Exception(f"Bundle upload failed with status {response.status_code}: {response.text[:500]}")
+    except Exception:
+        failed = True
+        raise
+    finally:
+        _complete_exec(exec_id, miqa_server, api_key, failed=failed)
+    return len(stream)
+
+def upload_dataset_chunked(run_id, miqa_server, dsid, path, api_key, checkpoint_store, chunk_size):
+    """
+    Upload a single large file in resumable chunks, checkpointing the upload
+    session and committed offset so a later invocation for the same run can
+    pick up where this one stopped. Returns the number of bytes sent.
+    """
+    exec_id, exec_info = _start_execution(run_id, miqa_server, dsid, path, api_key)
+    if exec_info is None:
+        return 0
+    cloud_provider = exec_info.get("cloud_provider", "aws")
+    bucket, key = exec_info.get("bucket"), exec_info.get("key")
+    st = os.stat(path)
+    if cloud_provider != "google" or st.st_size == 0:
+        # S3 presigned POSTs take the whole object in one request, and an empty file has no chunks.
+        if st.st_size:
+            print(f"Dataset {dsid}: chunked uploads are only supported for GCS; uploading {os.path.basename(path)} in one request")
+        failed = False
+        try:
+            _send_file(exec_info, os.path.dirname(path) or ".", os.path.basename(path), miqa_server, api_key)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _complete_exec(exec_id, miqa_server, api_key, failed=failed)
+        return st.st_size
+
+    identity = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "bucket": bucket, "key": key}
+    checkpoint = checkpoint_store.load(run_id, dsid, path)
+    offset = 0
+    if checkpoint and all(checkpoint.get(k) == v for k, v in identity.items()):
+        try:
+            offset = query_upload_offset(checkpoint["session_url"], st.st_size)
+            print(f"Dataset {dsid}: resuming upload of {os.path.basename(path)} at {format_bytes(offset)} of {format_bytes(st.st_size)}")
+        except Exception as e:
+            print(f"⚠️ Could not resume previous upload session for dataset {dsid} ({e}); starting over")
+            checkpoint = None
+    else:
+        checkpoint = None
+    if checkpoint is None:
+        session_url = get_upload_url(bucket, path, miqa_server, key, cloud_provider=cloud_provider, org_config_id=exec_info.get("org_config_id"), api_key=api_key)
+        checkpoint = dict(identity, session_url=session_url, offset=0)
+        checkpoint_store.save(run_id, dsid, path, checkpoint)
+        print(f"Dataset {dsid}: uploading {os.path.basename(path)} ({format_bytes(st.st_size)}) in {format_bytes(chunk_size)} chunks")
+
+    started, start_offset = time.time(), offset
+    last_reported = [offset * 10 // st.st_size]
+
+    def on_progress(committed):
+        checkpoint["offset"] = committed
+        checkpoint_store.save(run_id, dsid, path, checkpoint)
+        # Report roughly every 10% rather than on every chunk.
+        if committed * 10 // st.st_size > last_reported[0]:
+            last_reported[0] = committed * 10 // st.st_size
+            print(describe_progress(dsid, committed, st.st_size, started, start_offset))
+
+    try:
+        send_chunks(checkpoint["session_url"], path, offset, chunk_size, on_progress=on_progress)
+    except Exception:
+        # Leave the execution open and the checkpoint in place so that
+        # re-running with --resume-run-id continues from the last chunk.
+        print(f"⚠️ Upload for dataset {dsid} stopped at {format_bytes(checkpoint['offset'])}; re-run with --resume-run-id {run_id} to resume")
+        raise
+    checkpoint_store.clear(run_id, dsid, path)
+    _complete_exec(exec_id, miqa_server, api_key, failed=False)
+    return st.st_size - start_offset
+
+def _init_upload_worker():
+    # miqatools drives its folder upload through asyncio.get_event_loop(), which
+    # only exists by default on the main thread.
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+def _stat_path(path, path_stats=None):
+    if path_stats is not None:
+        return path_stats.stat(path)
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def _complete_empty_dataset(run_id, miqa_server, dsid, path, api_key, reason="not found"):
+    """
+    Start and complete, with no outputs, the execution of a dataset with
+    nothing to upload (e.g. its path doesn't exist), as the miqatools folder
+    upload does, so the run doesn't wait on it.
+    """
+    exec_id, exec_info = _start_execution(run_id, miqa_server, dsid, path, api_key)
+    if exec_info is None:
+        return
+    print(f"Dataset {dsid}: {path} {reason}; completing its execution with no outputs")
+    _complete_exec(exec_id, miqa_server, api_key, failed=False)
+
+def upload_dataset(run_id, miqa_server, dsid, path, api_key, manifest_store=None, path_stats=None, bundle_policy=None, chunked_upload=None, scanned=None):
+    """
+    Upload the outputs for a single dataset (a single file or a folder) and
+    return a result dict instead of raising, so one failure doesn't stop the rest.
+    `scanned` is the dataset's entry from the scan stage, if any; its file
+    list is used instead of walking the folder again.
+    """
+    started = time.time()
+    result = {"ds_id": dsid, "path": path, "started_at": started}
+    try:
+        if scanned is not None:
+            missing, is_file = scanned["missing"], scanned["is_file"]
+            file_size = scanned["bytes"] if is_file else None
+        elif isinstance(path, str):
+            st = _stat_path(path, path_stats)
+            missing, is_file = st is None, st is not None and stat.S_ISREG(st.st_mode)
+            file_size = st.st_size if is_file else None
+        else:
+            missing = is_file = False
+            file_size = None
+
+        folder_files = bundle_files = None
+        if not missing and not is_file and manifest_store is None:
+            if scanned is not None:
+                folder_files = scanned["files"]
+            elif bundle_policy is not None:
+                # Only list the folder when deciding whether to bundle it needs the list.
+                folder_files = list_bundle_files(path)
+            if folder_files is not None and bundle_policy is not None and bundle_policy.should_bundle(len(folder_files), sum(size for _, size in folder_files)):
+                bundle_files = folder_files
+
+        if missing:
+            _complete_empty_dataset(run_id, miqa_server, dsid, path, api_key)
+            result.update({"files": 0, "bytes": 0, "missing": True})
+        elif chunked_upload is not None and is_file and file_size >= chunked_upload["threshold"]:
+            result["files"] = 1
+            result["bytes"] = upload_dataset_chunked(
+                run_id, miqa_server, dsid, path, api_key, chunked_upload["checkpoint_store"], chunked_upload["chunk_size"]
+            )
+        elif bundle_files is not None:
+            result["files"] = result["bundled_files"] = len(bundle_files)
+            result["bytes"] = upload_dataset_bundle(run_id, miqa_server, dsid, path, bundle_files, api_key)
+        elif manifest_store is not None:
+            result["files_sent"], result["bytes"], result["bytes_skipped"] = upload_dataset_incremental(
+                run_id, miqa_server, dsid, path, api_key, manifest_store,
+                relpaths=[relpath for relpath, _ in scanned["files"]] if scanned is not None and not is_file else None,
+            )
+            result["files"] = result["files_sent"]
+        elif is_file:
+            folder = os.path.dirname(path) or "."
+            filename = os.path.basename(path)
+            print(f"Uploading single file {filename} from folder {folder} for dataset {dsid}")
+            result["files"] = 1
+            result["bytes"] = file_size
+            upload_to_test_by_dsid(
+                run_id,
+                miqa_server,
+                {dsid: folder},
+                filepatterns=None,
+                filepattern_end=filename,
+                quiet=False,
+                api_key=api_key,
+                detailed_file_logs=True,
+                halt_on_upload_failure=True,
+                halt_on_general_failure=True,
+            )
+        elif folder_files is not None:
+            # The folder was already listed (and maybe filtered), so send that list rather than have miqatools walk it again.
+            result["files"] = len(folder_files)
+            result["bytes"] = upload_dataset_files(run_id, miqa_server, dsid, path, folder_files, api_key)
+        else:
+            upload_to_test_by_dsid(
+                run_id,
+                miqa_server,
+                {dsid: path},
+                filepatterns=None,
+                quiet=False,
+                api_key=api_key,
+                detailed_file_logs=True,
+                halt_on_upload_failure=True,
+                halt_on_general_failure=True,
+            )
+        result["status"] = "success"
+    except Exception as e:
+        print(f"❌ Upload failed for dataset {dsid}: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+    seconds = max(time.time() - started, 1e-6)
+    result["seconds"] = round(seconds, 3)
+    if result["status"] == "success" and result.get("bytes"):
+        result["mb_per_s"] = round(result["bytes"] / (1024 * 1024) / seconds, 3)
+    return result
+
+def _governed_upload(rate_limiter, *args):
+    # Wait for a machine-wide upload slot and a rate limiter token before starting.
+    if rate_limiter is None:
+        return upload_dataset(*args)
+    with rate_limiter.slot("upload"):
+        rate_limiter.acquire()
+        return upload_dataset(*args)
+
+def upload_datasets(run_id, miqa_server, locations_lookup_by_sid, api_key, workers=1, manifest_store=None, path_stats=None, bundle_policy=None, chunked_upload=None, rate_limiter=None, upload_scan=None):
+    """
+    Upload every dataset in locations_lookup_by_sid, running up to `workers`
+    uploads at once. With an `upload_scan` ({dsid: scan} from the scan stage),
+    the largest datasets are started first so they don't end up running alone
+    at the end. Returns one result dict per dataset, in input order.
+    """
+    items = list(locations_lookup_by_sid.items())
+    if not items:
+        return []
+    upload_scan = upload_scan or {}
+    workers = max(1, min(workers or 1, len(items)))
+    if workers == 1:
+        _init_upload_worker()
+        return [
+            _governed_upload(rate_limiter, run_id, miqa_server, dsid, path, api_key, manifest_store, path_stats, bundle_policy, chunked_upload, upload_scan.get(dsid))
+            for dsid, path in items
+        ]
+
+    if upload_scan:
+        schedule = sorted(items, key=lambda item: upload_scan[item[0]]["bytes"] if item[0] in upload_scan else 0, reverse=True)
+    else:
+        schedule = items
+    print(f"⬆️ Uploading {len(items)} datasets with {workers} workers...")
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, initializer=_init_upload_worker) as pool:
+        futures = {
+            pool.submit(
+                contextvars.copy_context().run, _governed_upload, rate_limiter,
+                run_id, miqa_server, dsid, path, api_key, manifest_store, path_stats, bundle_policy, chunked_upload, upload_scan.get(dsid),
+            ): dsid
+            for dsid, path in schedule
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return [results[dsid] for dsid, _ in items]
+
+def bundle_policy_from_args(args):
+    if not args.bundle_small_files:
+        return None
+    return BundlePolicy(min_files=args.bundle_min_files, max_avg_bytes=int(args.bundle_max_avg_kb * 1024))
+
+def chunked_upload_from_args(args, miqa_server):
+    if not args.chunked_uploads:
+        return None
+    return {
+        "threshold": int(args.chunked_upload_threshold_mb * 1024 * 1024),
+        "chunk_size": aligned_chunk_size(args.chunk_size_mb),
+        "checkpoint_store": UploadCheckpointStore(miqa_server, cache_dir=args.upload_checkpoint_dir),
+    }
+
+def report_failed_uploads(upload_results):
+    failed_uploads = [r for r in upload_results if r["status"] != "success"]
+    if failed_uploads:
+        print(f"⚠️ {len(failed_uploads)} of {len(upload_results)} dataset uploads failed:")
+        for r in failed_uploads:
+            print(f"   {r['ds_id']}: {r.get('error')}")
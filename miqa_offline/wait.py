@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+
+def parse_wait_args(argv=None):
+    parser = argparse.ArgumentParser(prog="miqa-offline wait", description="Wait for one or more existing Miqa test chain runs to complete.")
+    parser.add_argument("--server", type=str, default=os.getenv("MIQA_SERVER"), required=not os.getenv("MIQA_SERVER"))
+    parser.add_argument("--api-key", type=str, default=os.getenv("MIQA_API_KEY"), required=not os.getenv("MIQA_API_KEY"))
+    parser.add_argument("--run-ids", type=str, nargs="+", required=True, help="Test chain run IDs to wait for")
+    parser.add_argument("--poll-initial-interval", type=float, default=5, help="First interval in seconds between status checks of a run")
+    parser.add_argument("--poll-frequency", type=float, default=60, help="Longest interval in seconds between status checks of a run")
+    parser.add_argument("--poll-timeout", type=float, default=3600, help="Overall deadline in seconds")
+    parser.add_argument("--max-concurrent-checks", type=int, default=8, help="Maximum status requests in flight at once")
+    parser.add_argument("--require-outcome", type=str, nargs="+", help="Outcomes that count as success (e.g. 'passed'); by default any completed run succeeds")
+    parser.add_argument("--download-reports", type=str, nargs="+", help="Report types to download for each run as soon as it completes (e.g. 'pdf', 'json')")
+    parser.add_argument("--report-folder", type=str, default=os.getenv("MIQA_REPORT_FOLDER", "."), help="Where to save downloaded reports")
+    parser.add_argument("--json-output-file", type=str, help="Optional path to write a JSON summary of every run")
+    parser.add_argument("--http-timeout", type=float, default=120, help="Timeout in seconds for each Miqa API request")
+    parser.add_argument("--http-retries", type=int, default=3, help="Retries for transient Miqa API failures (5xx, 429, connection errors)")
+    return parser.parse_args(argv)
+
+def wait_for_run_ids(args, client=None):
+    """
+    Wait for every run in args.run_ids with one shared client, downloading
+    reports for each as it completes. Returns (exit_code, results): the exit
+    code is non-zero if any run timed out, ended with an outcome outside
+    --require-outcome, or had a failed report download.
+    """
+    from .client import MiqaClient, normalize_miqa_endpoint
+    from .polling import wait_for_runs
+    from .reports import download_reports
+
+    if client is None:
+        client = MiqaClient(normalize_miqa_endpoint(args.server), args.api_key, timeout=args.http_timeout, max_retries=args.http_retries)
+    results = {run_id: {"run_id": run_id, "status": "timed_out"} for run_id in args.run_ids}
+
+    def on_complete(run_id, data):
+        result = results[run_id]
+        result.update({"status": "done", "outcome": data.get("outcome"), "link": data.get("link")})
+        if args.require_outcome and data.get("outcome") not in args.require_outcome:
+            result["status"] = "failed"
+            print(f"❌ Run {run_id} finished with outcome {data.get('outcome')} (expected {' or '.join(args.require_outcome)})")
+        if args.download_reports:
+            result["reports"] = download_reports(run_id, args.download_reports, args.report_folder, client)
+            if any(report["status"] != "success" for report in result["reports"]):
+                result["status"] = "report_failed"
+
+    print(f"⏳ Waiting for {len(args.run_ids)} run(s)...")
+    wait_for_runs(
+        {run_id: client for run_id in args.run_ids},
+        args.poll_timeout,
+        initial_interval=args.poll_initial_interval,
+        max_interval=args.poll_frequency,
+        on_complete=on_complete,
+        max_concurrent_checks=args.max_concurrent_checks,
+    )
+
+    print("\n📋 Run summary:")
+    for result in results.values():
+        details = " ".join(str(part) for part in (result.get("outcome"), result.get("link")) if part)
+        print(f"   {result['run_id']}: {result['status']} {details}".rstrip())
+    exit_code = 0 if all(result["status"] == "done" for result in results.values()) else 1
+    return exit_code, list(results.values())
+
+def main(argv=None):
+    args = parse_wait_args(argv)
+    exit_code, results = wait_for_run_ids(args)
+    if args.json_output_file:
+        with open(args.json_output_file, "w") as f:
+            json.dump({"runs": results}, f)
+    sys.exit(exit_code)
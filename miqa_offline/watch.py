@@ -0,0 +1,375 @@
+import contextvars
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .console import format_bytes
+from .uploads import _complete_empty_dataset, _complete_exec, _init_upload_worker, _send_file, _start_execution
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Even with inotify, rescan everything this often in case events were missed
+# (e.g. paths on network filesystems, which inotify doesn't see changes to).
+FULL_RESCAN_SECONDS = 60
+MAX_FILE_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 2
+# Finalize every dataset after this long, so a sample path that never appears can't keep the watch open forever.
+DEFAULT_WATCH_TIMEOUT = 24 * 60 * 60
+
+class InotifyWatcher:
+    """
+    A minimal ctypes binding to Linux inotify. It is only used to learn which
+    watched directories changed, so the watch loop can rescan just those
+    datasets instead of every path on every tick.
+    """
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # wd -> directory
+        self.wds = {}  # directory -> wd
+
+    def add(self, directory):
+        """Watch a directory. Returns False if it can't be watched (e.g. the inotify watch limit was reached)."""
+        if directory in self.wds:
+            return True
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.wds[directory] = wd
+        self.dirs[wd] = directory
+        return True
+
+    def read(self, timeout):
+        """
+        Wait up to `timeout` seconds for events. Returns the set of directories
+        that changed, or None if the kernel dropped events and everything
+        should be rescanned.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        changed = set()
+        while ready:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed = None
+                elif mask & IN_IGNORED:
+                    # The directory was removed; it gets a new watch if it reappears.
+                    self.wds.pop(self.dirs.pop(wd, None), None)
+                elif changed is not None and wd in self.dirs:
+                    changed.add(self.dirs[wd])
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class WatchPolicy:
+    """
+    When watched files count as stable and datasets as done. A file is stable
+    once its size and mtime haven't changed for `settle_seconds`. A dataset is
+    done when its `sentinel` file exists (if set) and everything is uploaded;
+    without a sentinel, a single-file dataset is done once its file is
+    uploaded and a folder once nothing in it has changed for `idle_seconds`.
+    """
+    def __init__(self, settle_seconds=30, idle_seconds=300, sentinel=None, poll_interval=5, timeout=DEFAULT_WATCH_TIMEOUT):
+        self.settle_seconds = settle_seconds
+        self.idle_seconds = idle_seconds
+        self.sentinel = sentinel
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+class DatasetWatch:
+    """Upload state of one watched dataset path."""
+    def __init__(self, dsid, path):
+        self.dsid = dsid
+        self.path = path
+        self.root = None
+        self.is_file = False
+        self.files = None  # relpath -> (size, mtime_ns, mtime), None until the path exists
+        self.folders = []
+        self.seen = {}  # relpath -> (signature, first seen at)
+        self.uploaded = {}  # relpath -> signature that was uploaded
+        self.attempts = {}  # relpath -> (signature, failed attempts)
+        self.retry_at = {}  # relpath -> earliest time to retry a failed upload
+        self.errors = {}  # relpath -> last upload error, until it succeeds
+        self.in_flight = set()
+        self.sentinel_present = False
+        self.last_change = 0
+        self.exec_id = None
+        self.exec_info = None
+        self.finished = False
+        self.result = {"ds_id": dsid, "path": path, "files": 0, "bytes": 0}
+
+    def sentinel_path(self, sentinel):
+        return os.path.join(self.root if not self.is_file else os.path.dirname(self.path), sentinel)
+
+    def directories(self):
+        """Directories to watch: the dataset folder and its subfolders, or the nearest existing ancestor."""
+        if self.files is None:
+            directory = os.path.dirname(self.path)
+            while directory and not os.path.isdir(directory) and directory != os.path.dirname(directory):
+                directory = os.path.dirname(directory)
+            return [directory] if directory else []
+        return [self.root] if self.is_file else self.folders
+
+    def _list_files(self, sentinel):
+        if os.path.isfile(self.path):
+            self.root, self.is_file = os.path.dirname(self.path) or ".", True
+            st = os.stat(self.path)
+            return {os.path.basename(self.path): (st.st_size, st.st_mtime_ns, st.st_mtime)}
+        if not os.path.isdir(self.path):
+            return None
+        self.root, self.is_file = self.path, False
+        files = {}
+        self.folders = []
+        stack = [self.path]
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    self.folders.append(folder)
+                    for entry in entries:
+                        # Symlinked folders aren't followed (they may loop), matching the scan and miqatools.
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=True) and not entry.name.endswith(".DS_Store") and entry.name != sentinel:
+                            try:
+                                st = entry.stat()
+                            except FileNotFoundError:
+                                continue  # Removed (e.g. a renamed temp file) since the listing.
+                            files[os.path.relpath(entry.path, self.path)] = (st.st_size, st.st_mtime_ns, st.st_mtime)
+            except FileNotFoundError:
+                continue
+        return files
+
+    def _settled(self, relpath, signature):
+        """Whether this version of a file needs no more work: it was uploaded, or failed too often to retry."""
+        if self.uploaded.get(relpath) == signature:
+            return True
+        failed_signature, attempts = self.attempts.get(relpath, (None, 0))
+        return failed_signature == signature and attempts >= MAX_FILE_ATTEMPTS
+
+    def scan(self, now, policy, force=False):
+        """Rescan the dataset path and return the files ready to upload. `force` treats every file as stable."""
+        files = self._list_files(policy.sentinel)
+        if files is None:
+            return []
+        if self.files is None and not self.is_file:
+            # Count the folder's own mtime as a change, so an empty folder is done once idle too.
+            try:
+                self.last_change = max(self.last_change, min(now, os.stat(self.path).st_mtime))
+            except OSError:
+                pass
+        self.files = files
+        self.sentinel_present = bool(policy.sentinel) and os.path.exists(self.sentinel_path(policy.sentinel))
+        ready = []
+        for relpath, (size, mtime_ns, mtime) in files.items():
+            signature = (size, mtime_ns)
+            if relpath in self.in_flight or self._settled(relpath, signature):
+                continue
+            if not force and self.retry_at.get(relpath, 0) > now:
+                continue
+            seen = self.seen.get(relpath)
+            if seen is None or seen[0] != signature:
+                seen = self.seen[relpath] = (signature, now)
+                self.last_change = max(self.last_change, min(now, mtime))
+            stable_since = min(seen[1], mtime)
+            if force or self.sentinel_present or now - stable_since >= policy.settle_seconds:
+                ready.append(relpath)
+        return ready
+
+    def has_unsettled_files(self):
+        return bool(self.files) and any(
+            not self._settled(relpath, (size, mtime_ns)) for relpath, (size, mtime_ns, _) in self.files.items()
+        )
+
+    def is_done(self, now, policy):
+        if self.files is None or self.in_flight or self.has_unsettled_files():
+            return False
+        if policy.sentinel:
+            return self.sentinel_present
+        return self.is_file or now - self.last_change >= policy.idle_seconds
+
+def _open_inotify():
+    if not hasattr(select, "select") or not os.path.exists("/proc/sys/fs/inotify"):
+        return None
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return None
+
+def _upload_watched_file(dataset, relpath, miqa_server, api_key, rate_limiter):
+    # _send_file raises on a rejected upload, so the file is retried rather than marked done.
+    if rate_limiter is None:
+        return _send_file(dataset.exec_info, dataset.root, relpath, miqa_server, api_key)
+    with rate_limiter.slot("upload"):
+        rate_limiter.acquire()
+        return _send_file(dataset.exec_info, dataset.root, relpath, miqa_server, api_key)
+
+def _finish_dataset(dataset, run_id, miqa_server, api_key, now):
+    dataset.finished = True
+    result = dataset.result
+    if dataset.exec_id is None:
+        # Nothing was uploaded, so the execution was never started; complete it
+        # empty so the run doesn't wait on it.
+        result.setdefault("started_at", now)
+        if dataset.files is None:
+            result.update({"status": "failed", "error": "path never appeared before the watch deadline", "missing": True})
+        try:
+            _complete_empty_dataset(run_id, miqa_server, dataset.dsid, dataset.path, api_key, "not found" if dataset.files is None else "has no files")
+        except Exception as e:
+            result.update({"status": "failed", "error": f"Could not complete execution: {e}"})
+    elif dataset.exec_info is not None:
+        failed = any(attempts >= MAX_FILE_ATTEMPTS for _, attempts in dataset.attempts.values())
+        try:
+            _complete_exec(dataset.exec_id, miqa_server, api_key, failed=failed)
+        except Exception as e:
+            result.setdefault("error", f"Could not complete execution: {e}")
+        if failed:
+            result["status"] = "failed"
+            result["error"] = "; ".join(dataset.errors.values())
+    result.setdefault("status", "success")
+    result["seconds"] = round(max(now - result["started_at"], 1e-6), 3)
+    print(
+        f"{'✅' if result['status'] == 'success' else '❌'} Dataset {dataset.dsid} finalized: "
+        f"{result['files']} files, {format_bytes(result['bytes'])}"
+    )
+
+def watch_and_upload(run_id, miqa_server, locations_lookup_by_sid, api_key, policy, workers=4, rate_limiter=None):
+    """
+    Watch each dataset's local path and upload its files as they become
+    stable, while they are still being produced. Each dataset's execution is
+    started with its first file and completed once the dataset is done (see
+    WatchPolicy) or the policy's timeout passes; at the deadline whatever
+    exists is uploaded as is. Returns one result dict per dataset, in input
+    order, like upload_datasets.
+    """
+    datasets = {dsid: DatasetWatch(dsid, path) for dsid, path in locations_lookup_by_sid.items()}
+    started = time.time()
+    deadline = started + policy.timeout
+    watcher = _open_inotify()
+    tick = max(0.1, min(policy.poll_interval, policy.settle_seconds / 2))
+    print(
+        f"👀 Watching {len(datasets)} dataset paths for stable outputs "
+        f"({'inotify' if watcher else f'polling every {policy.poll_interval}s'}"
+        f", deadline in {policy.timeout:g}s)..."
+    )
+
+    def watch_directories(dataset):
+        nonlocal watcher
+        for directory in dataset.directories():
+            if watcher and not watcher.add(directory):
+                print(f"⚠️ Could not watch {directory} with inotify (watch limit reached?); falling back to polling")
+                watcher.close()
+                watcher = None
+            if watcher:
+                watched[directory] = watched.get(directory, set()) | {dataset.dsid}
+
+    watched = {}  # directory -> dataset IDs to rescan when it changes
+    dirty = set(datasets)
+    in_flight = {}  # future -> (dataset, relpath, signature)
+    last_full_scan = started
+    final = False
+    with ThreadPoolExecutor(max_workers=max(1, workers), initializer=_init_upload_worker) as pool:
+        while True:
+            now = time.time()
+            final = final or now >= deadline
+            active = [dataset for dataset in datasets.values() if not dataset.finished]
+            if not active:
+                break
+
+            if watcher is None or final or now - last_full_scan >= FULL_RESCAN_SECONDS:
+                to_scan, last_full_scan = active, now
+            else:
+                to_scan = [d for d in active if d.dsid in dirty or d.has_unsettled_files()]
+            dirty = set()
+            for dataset in to_scan:
+                ready = dataset.scan(now, policy, force=final)
+                watch_directories(dataset)
+                if ready and dataset.exec_id is None:
+                    dataset.result["started_at"] = time.time()
+                    try:
+                        dataset.exec_id, dataset.exec_info = _start_execution(run_id, miqa_server, dataset.dsid, dataset.path, api_key)
+                    except Exception as e:
+                        print(f"❌ Could not start execution for dataset {dataset.dsid}: {e}")
+                        dataset.result.update({"status": "failed", "error": str(e), "seconds": 0})
+                        dataset.finished = True
+                        continue
+                    if dataset.exec_info is None:
+                        # Already complete in Miqa (e.g. when resuming a run).
+                        dataset.result.update({"status": "success", "seconds": 0})
+                        dataset.finished = True
+                        continue
+                for relpath in ready:
+                    size, mtime_ns, _ = dataset.files[relpath]
+                    dataset.in_flight.add(relpath)
+                    future = pool.submit(contextvars.copy_context().run, _upload_watched_file, dataset, relpath, miqa_server, api_key, rate_limiter)
+                    in_flight[future] = (dataset, relpath, (size, mtime_ns))
+
+            for future in [f for f in in_flight if f.done()]:
+                dataset, relpath, signature = in_flight.pop(future)
+                dataset.in_flight.discard(relpath)
+                error = future.exception()
+                if error is None:
+                    dataset.uploaded[relpath] = signature
+                    dataset.attempts.pop(relpath, None)
+                    dataset.retry_at.pop(relpath, None)
+                    dataset.errors.pop(relpath, None)
+                    dataset.result["files"] += 1
+                    dataset.result["bytes"] += signature[0]
+                else:
+                    previous_signature, attempts = dataset.attempts.get(relpath, (signature, 0))
+                    attempts = attempts + 1 if previous_signature == signature else 1
+                    dataset.attempts[relpath] = (signature, attempts)
+                    dataset.retry_at[relpath] = time.time() + RETRY_DELAY_SECONDS * 2 ** (attempts - 1)
+                    dataset.errors[relpath] = f"{relpath}: {error}"
+                    print(f"⚠️ Upload of {relpath} for dataset {dataset.dsid} failed (attempt {attempts}/{MAX_FILE_ATTEMPTS}): {error}")
+
+            now = time.time()
+            for dataset in active:
+                if not dataset.finished and (dataset.is_done(now, policy) or final and not dataset.in_flight):
+                    _finish_dataset(dataset, run_id, miqa_server, api_key, now)
+
+            if in_flight:
+                wait(list(in_flight), timeout=tick, return_when=FIRST_COMPLETED)
+            if watcher is not None:
+                changed = watcher.read(0 if in_flight else tick)
+                if changed is None:
+                    dirty = set(datasets)
+                else:
+                    dirty = {dsid for directory in changed for dsid in watched.get(directory, ())}
+            elif not in_flight:
+                time.sleep(tick if any(d.has_unsettled_files() for d in active) else policy.poll_interval)
+    if watcher:
+        watcher.close()
+    return [datasets[dsid].result for dsid in locations_lookup_by_sid]
+
+def watch_policy_from_args(args):
+    return WatchPolicy(
+        settle_seconds=args.watch_settle_seconds,
+        idle_seconds=args.watch_idle_seconds,
+        sentinel=args.watch_sentinel,
+        poll_interval=args.watch_poll_interval,
+        timeout=args.watch_timeout,
+    )